@@ -0,0 +1,95 @@
+import os
+import numpy as np
+
+
+def kmeans(vectors, k, iterations=10, seed=0):
+    """Spherical k-means on L2-normalized rows; returns k unit-length centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=k)
+        # Reseed empty clusters from random points so every list stays in use
+        empty = counts == 0
+        if np.any(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file partition of the embedding space into nlist k-means cells
+
+    A query is only compared against the rows of its nprobe closest cells, so
+    raising nprobe trades latency for recall (nprobe == nlist is exact search).
+    """
+
+    # Training points sampled per centroid
+    SAMPLES_PER_LIST = 64
+
+    def __init__(self, nlist, nprobe, centroids=None):
+        self.nlist = nlist
+        self.nprobe = max(1, min(nprobe, nlist))
+        self.centroids = centroids
+
+    @classmethod
+    def for_size(cls, size, nlist=0, nprobe=8):
+        """nlist defaults to ~4·√N, the usual IVF sizing"""
+        nlist = nlist or int(4 * np.sqrt(size))
+        return cls(max(1, min(nlist, size)), nprobe)
+
+    @property
+    def dim(self):
+        return self.centroids.shape[1] if self.centroids is not None else 0
+
+    def train(self, vectors, seed=0):
+        rng = np.random.default_rng(seed)
+        sample = min(len(vectors), self.SAMPLES_PER_LIST * self.nlist)
+        if sample < len(vectors):
+            vectors = vectors[rng.choice(len(vectors), sample, replace=False)]
+        self.centroids = kmeans(vectors, self.nlist, seed=seed)
+        return self
+
+    def assign(self, vectors, chunk=4096):
+        """Cell of every row, in chunks to bound the temporary score matrix"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk):
+            labels[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ self.centroids.T, axis=1)
+        return labels
+
+    def probe(self, queries):
+        """Boolean (queries × nlist) mask of the cells each query searches"""
+        scores = queries @ self.centroids.T
+        probed = np.zeros(scores.shape, dtype=bool)
+        if self.nprobe >= self.nlist:
+            probed[:] = True
+        else:
+            top = np.argpartition(-scores, self.nprobe - 1, axis=1)[:, :self.nprobe]
+            np.put_along_axis(probed, top, True, axis=1)
+        return probed
+
+    def save(self, path, student_ids, lists):
+        """Persist centroids plus every student's cell so a reload skips training"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, student_ids=np.asarray(student_ids, dtype=np.int64),
+                 lists=np.asarray(lists, dtype=np.int32))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, nprobe):
+        """Return (index, student_ids, lists) from a saved file, or None if missing/unreadable"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                centroids = data["centroids"].astype(np.float32)
+                return cls(len(centroids), nprobe, centroids), data["student_ids"], data["lists"]
+        except Exception as e:
+            print(f"⚠ Ignoring unreadable ANN index file {path}: {e}")
+            return None
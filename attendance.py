@@ -0,0 +1,288 @@
+import queue
+import threading
+import time
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL
+from database import SessionLocal
+from models import Student, Attendance
+from events import event_bus
+from metrics import metrics
+
+
+class AttendanceCache:
+    """Per-day sets of already-marked student ids plus the student name and batch lookups
+
+    Today's set is loaded at startup and the first call after midnight rolls it
+    over; other days (e.g. replayed recordings) are loaded once on first use.
+    Repeat sightings are answered without touching the database.
+    """
+
+    # Past days kept in memory besides today
+    MAX_DAYS = 7
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.day = None
+        self.marked_by_day = {}
+        self.names = {}
+        self.batches = {}
+
+    @property
+    def marked(self):
+        return self.marked_by_day.get(self.day, set())
+
+    def load(self, db, day):
+        """Reload students and the given day's marks from the database"""
+        students = db.query(Student.id, Student.name, Student.batch).all()
+        with self._lock:
+            self.day = day
+            self.names = {sid: name for sid, name, _ in students}
+            self.batches = {sid: batch for sid, _, batch in students}
+            self.marked_by_day = {}
+        self._load_day(db, day)
+
+    def _load_day(self, db, day):
+        marked = {sid for (sid,) in db.query(Attendance.student_id).filter(Attendance.date == day)}
+        with self._lock:
+            # Keep marks claimed while the query ran
+            self.marked_by_day[day] = marked | self.marked_by_day.get(day, set())
+            for old in sorted(d for d in self.marked_by_day if d != self.day)[:-self.MAX_DAYS]:
+                del self.marked_by_day[old]
+
+    def ensure_day(self, db, day):
+        """Roll the cache over when the date changes, or load a past day on first use"""
+        if self.day is None or day > self.day:
+            self.load(db, day)
+        elif day not in self.marked_by_day:
+            self._load_day(db, day)
+
+    def add_student(self, student_id, name, batch=None):
+        with self._lock:
+            self.names[student_id] = name
+            self.batches[student_id] = batch
+
+    def claim(self, student_id, day):
+        """Mark a student for a day; returns False if they were already marked"""
+        with self._lock:
+            marked = self.marked_by_day.setdefault(day, set())
+            if student_id in marked:
+                return False
+            marked.add(student_id)
+            return True
+
+    def release(self, student_id, day):
+        """Undo a claim whose row could not be written, so the next sighting marks the student again"""
+        with self._lock:
+            self.marked_by_day.get(day, set()).discard(student_id)
+
+
+class AttendanceWriter:
+    """Write-behind queue: one thread inserts attendance rows in batches
+
+    Rows are flushed when WRITE_BATCH_SIZE are pending or WRITE_FLUSH_INTERVAL
+    has passed, in a single insert-or-ignore transaction, so recognition never
+    waits on SQLite locks. A batch that keeps failing goes back on the queue;
+    rows that still fail after REQUEUES rounds are dropped and their cache
+    claims released.
+    """
+
+    # Write attempts per batch, and times a failed row is put back on the queue
+    ATTEMPTS = 3
+    REQUEUES = 5
+
+    def __init__(self, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.rows_written = 0
+        self.rows_ignored = 0
+        self.flushes = 0
+        self.errors = 0
+        self.rows_dropped = 0
+        # (student_id, date) -> times the row was put back after failing
+        self._requeued = {}
+        self.last_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        """Flush everything still queued, then stop the writer thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def enqueue(self, student_id, when, camera_id=None):
+        self._queue.put({"student_id": student_id, "time": when.time(), "date": when.date(), "camera_id": camera_id})
+        if self._thread is None:
+            self.start()
+
+    def flush(self):
+        """Block until every queued row has been written"""
+        self._queue.join()
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        for attempt in range(self.ATTEMPTS):
+            db = SessionLocal()
+            try:
+                result = db.execute(
+                    sqlite_insert(Attendance.__table__).on_conflict_do_nothing(index_elements=["student_id", "date"]),
+                    batch
+                )
+                db.commit()
+                metrics.observe("db_write", time.perf_counter() - started)
+                written = max(result.rowcount, 0)
+                self.rows_written += written
+                self.rows_ignored += len(batch) - written
+                for row in batch:
+                    self._requeued.pop((row["student_id"], row["date"]), None)
+                break
+            except Exception as e:
+                db.rollback()
+                self.errors += 1
+                metrics.count("errors_total", stage="db_write")
+                print(f"⚠ Attendance write failed (attempt {attempt + 1}): {e}")
+                if attempt + 1 < self.ATTEMPTS:
+                    time.sleep(0.5 * (attempt + 1))
+            finally:
+                db.close()
+        else:
+            self._requeue(batch)
+
+        self.flushes += 1
+        self.last_flush_seconds = time.perf_counter() - started
+        self.total_flush_seconds += self.last_flush_seconds
+        for _ in batch:
+            self._queue.task_done()
+
+    def _requeue(self, batch):
+        """Put failed rows back on the queue, dropping (and unclaiming) those that failed too often"""
+        dropped = 0
+        for row in batch:
+            key = (row["student_id"], row["date"])
+            self._requeued[key] = self._requeued.get(key, 0) + 1
+            if self._requeued[key] <= self.REQUEUES:
+                self._queue.put(row)
+                continue
+            del self._requeued[key]
+            attendance_cache.release(row["student_id"], row["date"])
+            dropped += 1
+        if dropped:
+            self.rows_dropped += dropped
+            print(f"❌ Dropped {dropped} attendance rows after repeated write failures, they will be marked on the next sighting")
+
+    def status(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "rows_written": self.rows_written,
+            "rows_ignored": self.rows_ignored,
+            "flushes": self.flushes,
+            "errors": self.errors,
+            "rows_dropped": self.rows_dropped,
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 2),
+            "avg_flush_ms": round(self.total_flush_seconds * 1000 / self.flushes, 2) if self.flushes else 0.0,
+        }
+
+
+# Shared cache and writer for the API process
+attendance_cache = AttendanceCache()
+attendance_writer = AttendanceWriter()
+
+def record_attendance(db, student_ids, when=None, camera=None, camera_id=None):
+    """Mark attendance for recognized student ids and return one label per recognized face
+
+    Duplicates are answered from the in-memory cache; new marks are queued for
+    the write-behind writer instead of being committed here. Each new mark and
+    the recognition as a whole are published on the event bus. camera names the
+    source in events; camera_id is the registry id stored on the attendance row.
+    """
+    when = when or datetime.now()
+    day = when.date()
+    attendance_cache.ensure_day(db, day)
+
+    marked_names = []
+    recognized = []
+
+    for student_id in student_ids:
+        try:
+            if student_id is None:
+                metrics.count("faces_total", result="unknown")
+                continue
+
+            name = attendance_cache.names.get(student_id)
+            if name is None:
+                # Enrolled by another worker since the cache was loaded
+                student = db.query(Student).filter(Student.id == student_id).first()
+                if not student:
+                    metrics.count("faces_total", result="unknown")
+                    marked_names.append(f"{student_id} (not registered)")
+                    continue
+                name = student.name
+                attendance_cache.add_student(student.id, name, student.batch)
+
+            batch = attendance_cache.batches.get(student_id)
+            recognized.append({"student_id": student_id, "name": name, "batch": batch})
+
+            if not attendance_cache.claim(student_id, day):
+                metrics.count("faces_total", result="already_marked")
+                marked_names.append(f"{name} (Already Marked)")
+                continue
+
+            # The unique (student_id, date) index settles races with other processes
+            attendance_writer.enqueue(student_id, when, camera_id)
+            marked_names.append(name)
+            metrics.count("faces_total", result="recognized")
+            event_bus.publish("attendance_marked", camera=camera, camera_id=camera_id, student_id=student_id, name=name, batch=batch,
+                              batches=[batch], date=day.isoformat(), marked_at=when.time().isoformat(timespec="seconds"))
+
+        except Exception as e:
+            metrics.count("errors_total", stage="record")
+            print(f"Error processing face: {e}")
+            continue
+
+    if student_ids:
+        event_bus.publish("recognition", camera=camera, camera_id=camera_id, faces=len(student_ids), students=recognized,
+                          batches=sorted({s["batch"] for s in recognized if s["batch"]}),
+                          marked=marked_names, message=attendance_message(True, marked_names))
+    return marked_names
+
+def attendance_message(faces_found, marked_names):
+    """User-facing summary of one recognition attempt"""
+    if not marked_names:
+        if faces_found:
+            return "😕 Faces detected but not recognized"
+        return "😕 No faces detected"
+
+    if any("(not registered)" in name for name in marked_names):
+        return "⚠ Some faces not registered: " + ", ".join(marked_names)
+    elif any("(Already Marked)" in name for name in marked_names):
+        return "ℹ Attendance already marked for: " + ", ".join(marked_names)
+    return "✅ Attendance marked for: " + ", ".join(marked_names)
@@ -0,0 +1,322 @@
+"""Offline benchmark of /mark_attendance/, face search and attendance writes
+
+    python benchmark.py --sizes 100,1000,10000 --requests 200 --concurrency 1,4,8 --output run.json
+    python benchmark.py --frames recordings/hall-a.mp4 --baseline run.json --output new.json
+
+Runs the real app (models, worker pool, index, SQLite) in a temporary working
+directory with a synthetic camera, so nothing touches the live database. Each
+enrollment size gets random unit embeddings of the model's dimension; query
+frames come from --frames (image folder or video) or are synthetic. Synthetic
+frames rarely contain a detectable face, so use recorded frames to time the
+embed and search stages end to end.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def latency_summary(seconds):
+    if not seconds:
+        return {"count": 0}
+    ms = np.asarray(seconds) * 1000
+    return {
+        "count": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+    }
+
+def load_frames(path, limit):
+    """JPEG-encoded query frames from a folder of images or a video file, or synthetic ones"""
+    import cv2
+    from camera import SyntheticCapture
+
+    frames = []
+    if path and os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.lower().endswith(IMAGE_EXTENSIONS) and len(frames) < limit:
+                with open(os.path.join(path, name), "rb") as f:
+                    frames.append(f.read())
+    else:
+        cap = cv2.VideoCapture(path) if path else SyntheticCapture()
+        if path and not cap.isOpened():
+            raise ValueError(f"Cannot open {path}")
+        # Spread the samples over the whole recording
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0) if path else 0
+        stride = max(1, total // limit) if total else 1
+        index = 0
+        while len(frames) < limit:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if index % stride == 0:
+                frames.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes())
+            index += 1
+        cap.release()
+    if not frames:
+        raise ValueError(f"No frames found in {path}")
+    return frames
+
+def enroll_synthetic(db, students, dim, seed=0):
+    """Replace every student with synthetic ones and rebuild the face index from scratch
+
+    Returns the build seconds (log replay, snapshot write, ANN training if enabled)
+    and the enrolled embeddings.
+    """
+    from config import MODEL_NAME, EMBEDDING_STORE_PATH, ANN_INDEX_PATH
+    from models import Student, Attendance
+    from face_index import embedding_log, l2_normalize
+    from detect import build_face_index
+    from attendance import attendance_cache, attendance_writer
+
+    attendance_writer.flush()
+    db.query(Attendance).delete()
+    db.query(Student).delete()
+    db.commit()
+    db.bulk_insert_mappings(Student, [
+        {"id": i, "name": f"student-{i}", "roll_no": f"R{i:06d}", "course": "BENCH",
+         "batch": f"B{i % 20}", "lecture": f"L{i % 6}", "image": os.path.join("images", "faces", f"student-{i}.png")}
+        for i in range(1, students + 1)
+    ])
+    db.commit()
+
+    rng = np.random.default_rng(seed)
+    embeddings = l2_normalize(rng.standard_normal((students, dim)).astype(np.float32))
+    embedding_log.rewrite(dict(zip(range(1, students + 1), embeddings)), MODEL_NAME)
+    # Time a cold build, not a snapshot reused from the previous size
+    for path in (EMBEDDING_STORE_PATH, ANN_INDEX_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+    started = time.perf_counter()
+    build_face_index(db.query(Student).all())
+    seconds = time.perf_counter() - started
+    attendance_cache.load(db, date.today())
+    return seconds, embeddings
+
+def bench_search(embeddings, queries, batch):
+    """Mean per-query milliseconds of face_index.search with noisy enrolled embeddings as queries"""
+    from face_index import face_index, l2_normalize
+    rng = np.random.default_rng(1)
+    rows = rng.integers(0, len(embeddings), queries)
+    probes = l2_normalize(embeddings[rows] + 0.05 * rng.standard_normal((queries, embeddings.shape[1])).astype(np.float32))
+    face_index.search(probes[:batch], k=1)
+    started = time.perf_counter()
+    for i in range(0, queries, batch):
+        face_index.search(probes[i:i + batch], k=1)
+    return round((time.perf_counter() - started) * 1000 / queries, 4)
+
+def bench_store_dtypes(embeddings, queries, batch=1):
+    """Mean per-query milliseconds of an exact search over resident float32 rows and each mapped store dtype"""
+    from embedding_store import EmbeddingStore
+    from face_index import FaceIndex
+    ids = list(range(1, len(embeddings) + 1))
+    rng = np.random.default_rng(2)
+    probes = embeddings[rng.integers(0, len(embeddings), queries)]
+    results = {}
+    for dtype in ("none",) + tuple(EmbeddingStore.DTYPES):
+        index = FaceIndex(mode="exact")
+        if dtype == "none":
+            index.load(ids, embeddings)
+        else:
+            index.open_store(EmbeddingStore.write(os.path.join("index", f"bench-{dtype}.emb"), ids, embeddings,
+                                                  "bench", dtype))
+        index.search(probes[:batch], k=1)
+        started = time.perf_counter()
+        for i in range(0, queries, batch):
+            index.search(probes[i:i + batch], k=1)
+        results[dtype] = round((time.perf_counter() - started) * 1000 / queries, 4)
+    return results
+
+def bench_requests(client, frames, requests, concurrency):
+    """POST frames to /mark_attendance/ from `concurrency` threads; latency, throughput and stage percentiles"""
+    from metrics import metrics
+    from frame_cache import frame_cache
+
+    def post(i):
+        started = time.perf_counter()
+        r = client.post("/mark_attendance/", files={"file": (f"frame{i}.jpg", frames[i % len(frames)], "image/jpeg")})
+        return r.status_code, time.perf_counter() - started
+
+    metrics.reset()
+    cache_before = frame_cache.hits, frame_cache.misses
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(post, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = [seconds for status, seconds in results if status == 200]
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "statuses": statuses,
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency": latency_summary(ok),
+        "stages": metrics.snapshot()["stages"],
+        # Frames repeat across requests, so with the cache on most latencies are hits
+        "result_cache": {"hits": frame_cache.hits - cache_before[0], "misses": frame_cache.misses - cache_before[1]},
+    }
+
+def bench_writes(students, days):
+    """Rows per second through the write-behind attendance writer"""
+    from attendance import AttendanceWriter
+    writer = AttendanceWriter().start()
+    first = datetime.now() - timedelta(days=days + 1)
+    started = time.perf_counter()
+    for day in range(days):
+        when = first + timedelta(days=day)
+        for student_id in range(1, students + 1):
+            writer.enqueue(student_id, when)
+    writer.flush()
+    elapsed = time.perf_counter() - started
+    writer.stop()
+    rows = students * days
+    return {"rows": rows, "seconds": round(elapsed, 3), "rows_per_second": round(rows / elapsed, 1),
+            "writer": writer.status()}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+def compare(baseline, results):
+    """Print p50/p95 and throughput changes against an earlier run"""
+    old_runs = {(s["students"], r["concurrency"]): r for s in baseline.get("sizes", []) for r in s["requests"]}
+    for size in results["sizes"]:
+        for run in size["requests"]:
+            old = old_runs.get((size["students"], run["concurrency"]))
+            if not old or not old["latency"].get("count") or not run["latency"].get("count"):
+                continue
+            changes = [
+                f"{key} {old['latency'][key]:.1f}→{run['latency'][key]:.1f}ms "
+                f"({(run['latency'][key] / old['latency'][key] - 1) * 100:+.0f}%)"
+                for key in ("p50_ms", "p95_ms") if old["latency"][key]
+            ]
+            print(f"  vs baseline N={size['students']} c={run['concurrency']}: " + ", ".join(changes) +
+                  f", {old['throughput_rps']}→{run['throughput_rps']} req/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000", help="enrolled students per run")
+    parser.add_argument("--requests", type=int, default=100, help="/mark_attendance/ calls per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,8", help="concurrent clients")
+    parser.add_argument("--frames", help="folder of images or a video file to use as query frames")
+    parser.add_argument("--max-frames", type=int, default=50)
+    parser.add_argument("--search-queries", type=int, default=500)
+    parser.add_argument("--write-days", type=int, default=3, help="days of attendance written per student")
+    parser.add_argument("--result-cache", action="store_true",
+                        help="keep the /mark_attendance/ result cache on (off by default so every request is recognized)")
+    parser.add_argument("--baseline", help="earlier JSON result to compare against")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    frames_path = os.path.abspath(args.frames) if args.frames else None
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    # The app keeps its database, images and index relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="attendance-bench-")
+    os.chdir(workdir)
+    os.environ.setdefault("CAMERA_SOURCE", "synthetic")
+    if not args.result_cache:
+        os.environ["RESULT_CACHE_SIZE"] = "0"
+    sys.path.insert(0, REPO_DIR)
+
+    from fastapi.testclient import TestClient
+    import main as app_module
+    from config import (MODEL_NAME, DETECTOR_BACKEND, FACE_INDEX_MODE, EMBEDDING_STORE_DTYPE,
+                        RECOGNITION_EXECUTOR, RECOGNITION_WORKERS, WRITE_BATCH_SIZE, RESULT_CACHE_SIZE)
+    from database import SessionLocal
+    from model_lifecycle import model_lifecycle
+
+    frames = load_frames(frames_path, args.max_frames)
+    results = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": {
+            "model": MODEL_NAME, "detector": DETECTOR_BACKEND, "index_mode": FACE_INDEX_MODE,
+            "store_dtype": EMBEDDING_STORE_DTYPE, "executor": RECOGNITION_EXECUTOR,
+            "workers": RECOGNITION_WORKERS, "write_batch_size": WRITE_BATCH_SIZE, "result_cache_size": RESULT_CACHE_SIZE,
+            "cpus": os.cpu_count(),
+        },
+        "frames": {"source": frames_path or "synthetic", "count": len(frames)},
+        "sizes": [],
+    }
+
+    with TestClient(app_module.app) as client:
+        if not model_lifecycle.wait(600) or model_lifecycle.state != "ready":
+            print(f"❌ Models did not load: {model_lifecycle.error}")
+            sys.exit(1)
+        results["startup"] = model_lifecycle.health()["timings"]
+
+        from detect import embed_faces
+        dim = embed_faces([{"face": np.zeros((224, 224, 3), dtype=np.float32)}]).shape[1]
+        results["embedding_dim"] = dim
+
+        db = SessionLocal()
+        try:
+            for students in (int(n) for n in args.sizes.split(",")):
+                build_seconds, embeddings = enroll_synthetic(db, students, dim, seed=students)
+                size = {
+                    "students": students,
+                    "index_build_seconds": round(build_seconds, 3),
+                    "search_ms_per_query": {
+                        "batch_1": bench_search(embeddings, args.search_queries, 1),
+                        "batch_8": bench_search(embeddings, args.search_queries, 8),
+                    },
+                    # Same embeddings searched resident and from each memory-mapped store dtype
+                    "store_search_ms_per_query": bench_store_dtypes(embeddings, args.search_queries),
+                    "requests": [],
+                }
+                print(f"📋 N={students}: index built in {build_seconds:.2f}s, "
+                      f"search {size['search_ms_per_query']['batch_1']:.3f} ms/query, by store dtype "
+                      + ", ".join(f"{d} {ms:.3f}" for d, ms in size["store_search_ms_per_query"].items()))
+
+                for concurrency in (int(c) for c in args.concurrency.split(",")):
+                    run = bench_requests(client, frames, args.requests, concurrency)
+                    size["requests"].append(run)
+                    latency = run["latency"]
+                    print(f"  c={concurrency:<3} {run['throughput_rps']:7.2f} req/s  "
+                          f"p50={latency.get('p50_ms', 0):.1f}ms p95={latency.get('p95_ms', 0):.1f}ms "
+                          f"p99={latency.get('p99_ms', 0):.1f}ms  {run['statuses']}"
+                          + (f"  cache {run['result_cache']['hits']} hits/{run['result_cache']['misses']} misses"
+                             if args.result_cache else ""))
+
+                size["db_write"] = bench_writes(students, args.write_days)
+                print(f"  writes: {size['db_write']['rows_per_second']:.0f} rows/s")
+                results["sizes"].append(size)
+        finally:
+            db.close()
+
+    os.chdir(REPO_DIR)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    if baseline:
+        compare(baseline, results)
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {output}")
+
+if __name__ == "__main__":
+    main()
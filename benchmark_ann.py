@@ -0,0 +1,86 @@
+"""Compare IVF and exact face search on synthetic embeddings
+
+    python benchmark_ann.py --students 100000 --dim 4096 --queries 500 --nprobe 1,4,8,16,32
+
+Every query is an enrolled embedding plus noise (another photo of the same
+person), so exact search gives the ground truth for recall@1.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+
+from face_index import FaceIndex, l2_normalize
+
+
+def synthetic_embeddings(students, dim, queries, noise, seed=0):
+    rng = np.random.default_rng(seed)
+    enrolled = l2_normalize(rng.standard_normal((students, dim)).astype(np.float32))
+    targets = rng.choice(students, queries, replace=False)
+    probes = l2_normalize(enrolled[targets] + noise * rng.standard_normal((queries, dim)).astype(np.float32) / np.sqrt(dim))
+    return enrolled, probes
+
+def timed_search(index, queries, batch):
+    """Top-1 ids and mean per-query latency in milliseconds"""
+    ids = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch):
+        ids.extend(hits[0][0] if hits else None for hits in index.search(queries[i:i + batch], k=1))
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=4096)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=1, help="queries per search call (faces per frame)")
+    parser.add_argument("--noise", type=float, default=0.8, help="query noise relative to the embedding norm")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF cells (0 = about 4·√N)")
+    parser.add_argument("--nprobe", default="1,4,8,16,32")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    enrolled, queries = synthetic_embeddings(args.students, args.dim, args.queries, args.noise)
+    ids = np.arange(1, args.students + 1)
+
+    exact = FaceIndex(mode="exact")
+    exact.load(ids, enrolled)
+    truth, exact_ms = timed_search(exact, queries, args.batch)
+    print(f"exact          recall@1=1.000  {exact_ms:8.3f} ms/query")
+    results = {"students": args.students, "dim": args.dim, "queries": args.queries,
+               "exact_ms": exact_ms, "ivf": []}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.ivf.npz")
+        ivf = FaceIndex(mode="ivf", nlist=args.nlist, min_size=0)
+        ivf.load(ids, enrolled)
+        start = time.perf_counter()
+        ivf.build_ann(path)
+        results["train_seconds"] = time.perf_counter() - start
+
+        # Reload from disk: must not retrain
+        start = time.perf_counter()
+        ivf.load(ids, enrolled)
+        ivf.build_ann(path)
+        results["reload_seconds"] = time.perf_counter() - start
+        print(f"ivf train {results['train_seconds']:.2f}s, reload {results['reload_seconds']:.2f}s, "
+              f"nlist={ivf.status()['nlist']}")
+
+        for nprobe in (int(n) for n in args.nprobe.split(",")):
+            # Each setting reloads the saved cells, as a restarted server would
+            probe_index = FaceIndex(mode="ivf", nlist=args.nlist, nprobe=nprobe, min_size=0)
+            probe_index.load(ids, enrolled)
+            probe_index.build_ann(path)
+            found, ms = timed_search(probe_index, queries, args.batch)
+            recall = float(np.mean([a == b for a, b in zip(found, truth)]))
+            print(f"ivf nprobe={nprobe:<4} recall@1={recall:.3f}  {ms:8.3f} ms/query  ({exact_ms / ms:.1f}x)")
+            results["ivf"].append({"nprobe": nprobe, "recall_at_1": recall, "ms_per_query": ms})
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
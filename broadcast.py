@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+import cv2
+
+from config import STREAM_FPS, STREAM_JPEG_QUALITY, STREAM_WIDTH
+from subscribers import Subscribers
+
+
+class MJPEGBroadcaster:
+    """Encodes the newest camera frame once per tick and fans the JPEG out to every viewer
+
+    Viewers always pick up the latest encoded buffer, so a slow client skips
+    frames instead of queueing them, and ten viewers cost one encode per tick.
+    The encoder idles while nobody is watching.
+    """
+
+    # A viewer that has not asked for a frame this long is considered gone
+    VIEWER_TIMEOUT = 2.0
+
+    def __init__(self, stream, fps=STREAM_FPS, quality=STREAM_JPEG_QUALITY, width=STREAM_WIDTH, overlay=None):
+        self.stream = stream
+        self.fps = max(0.1, fps)
+        self.quality = quality
+        self.width = width
+        # Callable returning [(facial_area, label)] in camera-frame coordinates, or None
+        self.overlay = overlay
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._seq = 0
+        self._jpeg = None
+        self._viewers = Subscribers(self.VIEWER_TIMEOUT)
+        self.frames_encoded = 0
+        self.encode_seconds = 0.0
+        self.frames_sent = 0
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"broadcast:{self.stream.source}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def viewers(self):
+        return len(self._viewers)
+
+    async def frames(self):
+        """Multipart MJPEG chunks for one viewer, always the newest encoded frame"""
+        token = self._viewers.join()
+        seq = 0
+        try:
+            while not self._stop.is_set():
+                self._viewers.touch(token)
+                # Polling at twice the encode rate costs nothing and holds no thread
+                if self._seq <= seq:
+                    await asyncio.sleep(0.5 / self.fps)
+                    continue
+                with self._cond:
+                    seq, jpeg = self._seq, self._jpeg
+                self.frames_sent += 1
+                yield (
+                    b"--frame\r\n"
+                    b"Content-Type: image/jpeg\r\n"
+                    b"Content-Length: " + str(len(jpeg)).encode() + b"\r\n\r\n" +
+                    jpeg +
+                    b"\r\n"
+                )
+        finally:
+            self._viewers.leave(token)
+
+    def status(self):
+        return {
+            "viewers": self.viewers,
+            "fps": self.fps,
+            "quality": self.quality,
+            "width": self.width,
+            "frames_encoded": self.frames_encoded,
+            "frames_sent": self.frames_sent,
+            "avg_encode_ms": round(self.encode_seconds * 1000 / self.frames_encoded, 2) if self.frames_encoded else 0.0,
+            "frame_bytes": len(self._jpeg) if self._jpeg else 0,
+        }
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        seq = 0
+        while not self._stop.is_set():
+            # Nobody watching: nothing to encode
+            if not self.viewers:
+                self._stop.wait(0.2)
+                continue
+
+            tick = time.monotonic()
+            item = self.stream.wait_for_frame(seq, timeout=1.0)
+            if item is None:
+                continue
+            seq, _, frame = item
+
+            started = time.perf_counter()
+            try:
+                jpeg = self._encode(frame)
+            except Exception as e:
+                print(f"Stream encode error: {e}")
+                jpeg = None
+            if jpeg is not None:
+                self.encode_seconds += time.perf_counter() - started
+                self.frames_encoded += 1
+                with self._cond:
+                    self._seq += 1
+                    self._jpeg = jpeg
+                    self._cond.notify_all()
+
+            # Hold the configured rate; the camera usually delivers faster
+            self._stop.wait(max(0.0, interval - (time.monotonic() - tick)))
+
+    def _encode(self, frame):
+        scale = self.width / frame.shape[1] if self.width and frame.shape[1] > self.width else 1.0
+        if scale != 1.0:
+            frame = cv2.resize(frame, (self.width, round(frame.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+        else:
+            frame = frame.copy()
+
+        for area, label in (self.overlay() if self.overlay else None) or []:
+            x, y = round(area["x"] * scale), round(area["y"] * scale)
+            w, h = round(area["w"] * scale), round(area["h"] * scale)
+            color = (0, 200, 0) if label else (0, 0, 255)
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+            cv2.putText(frame, label or "Unknown", (x, max(12, y - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return buffer.tobytes() if ok else None
+
+
+_broadcasters = {}
+_broadcasters_lock = threading.Lock()
+
+def get_broadcaster(stream, overlay=None):
+    """Shared, running broadcaster for a camera stream (one encoder per camera)"""
+    with _broadcasters_lock:
+        broadcaster = _broadcasters.get(stream.source)
+        if broadcaster is None:
+            broadcaster = _broadcasters[stream.source] = MJPEGBroadcaster(stream, overlay=overlay)
+        return broadcaster.start()
+
+def find_broadcaster(source):
+    """The broadcaster for a camera source if a viewer has started one, without starting it"""
+    with _broadcasters_lock:
+        return _broadcasters.get(source)
+
+def close_broadcaster(source):
+    """Stop the encoder of a camera stream, if one was started; its viewers' responses end"""
+    with _broadcasters_lock:
+        broadcaster = _broadcasters.pop(source, None)
+    if broadcaster is not None:
+        broadcaster.stop()
+
+def stop_all_broadcasters():
+    with _broadcasters_lock:
+        broadcasters = list(_broadcasters.values())
+        _broadcasters.clear()
+    for broadcaster in broadcasters:
+        broadcaster.stop()
@@ -0,0 +1,225 @@
+import threading
+import time
+import os
+from collections import deque
+import cv2
+import numpy as np
+
+from metrics import metrics
+
+
+class SyntheticCapture:
+    """Stand-in for cv2.VideoCapture that generates moving test frames offline"""
+
+    def __init__(self, width=640, height=480, fps=25):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.count = 0
+        self._next = time.monotonic()
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        return False
+
+    def read(self):
+        # Pace like a live camera
+        self._next += 1.0 / self.fps
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            self._next = time.monotonic()
+
+        frame = np.full((self.height, self.width, 3), 40, dtype=np.uint8)
+        x = (self.count * 8) % max(self.width - 80, 1)
+        cv2.rectangle(frame, (x, self.height // 3), (x + 80, self.height // 3 + 80), (0, 200, 0), -1)
+        cv2.putText(frame, str(self.count), (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        self.count += 1
+        return True, frame
+
+    def release(self):
+        pass
+
+
+def open_capture(source):
+    """Open an RTSP/HTTP URL, a local video file, or "synthetic[:WxH]" for offline testing"""
+    if source.startswith("synthetic"):
+        size = source.partition(":")[2]
+        if size:
+            width, height = (int(v) for v in size.lower().split("x"))
+            return SyntheticCapture(width, height)
+        return SyntheticCapture()
+
+    # Try with FFMPEG backend first
+    cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        print("FFMPEG backend failed, trying default backend...")
+        cap = cv2.VideoCapture(source)
+
+    # Keep only the newest frame in the decoder queue
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+class CameraStream:
+    """Background thread that keeps one camera open and publishes its newest frames"""
+
+    def __init__(self, source, buffer_size=4, max_backoff=30.0):
+        self.source = source
+        self.max_backoff = max_backoff
+        # Ring buffer of (sequence, timestamp, frame), newest last
+        self._frames = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._seq = 0
+        self.connected = False
+        self.last_error = None
+        self.reconnects = 0
+        self.frame_size = None
+        self._fps = 0.0
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"camera:{self.source}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def latest(self):
+        """Return (frame, timestamp) of the newest frame without blocking, or (None, None)"""
+        with self._cond:
+            if not self._frames:
+                return None, None
+            _, ts, frame = self._frames[-1]
+            return frame, ts
+
+    def wait_for_frame(self, after_seq=0, timeout=1.0):
+        """Block until a frame newer than after_seq arrives; returns (seq, timestamp, frame) or None"""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._stop.is_set() or (self._frames and self._frames[-1][0] > after_seq),
+                timeout
+            )
+            if self._frames and self._frames[-1][0] > after_seq:
+                return self._frames[-1]
+            return None
+
+    def status(self):
+        frame, ts = self.latest()
+        return {
+            "source": self.source,
+            "connected": self.connected,
+            "frame_size": self.frame_size,
+            "fps": round(self._fps, 1),
+            "frame_age": round(time.time() - ts, 3) if ts else None,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+        }
+
+    def _publish(self, frame):
+        with self._cond:
+            self._seq += 1
+            self._frames.append((self._seq, time.time(), frame))
+            self._cond.notify_all()
+
+    def _run(self):
+        backoff = 1.0
+        is_file = os.path.isfile(self.source)
+
+        while not self._stop.is_set():
+            cap = None
+            try:
+                with metrics.timer("camera_connect"):
+                    cap = open_capture(self.source)
+                if not cap.isOpened():
+                    raise ConnectionError("Cannot connect to IP camera")
+
+                # Video files are replayed at their native rate to behave like a live stream
+                file_interval = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 25) if is_file else 0
+                last = time.monotonic()
+
+                while not self._stop.is_set():
+                    read_started = time.perf_counter()
+                    ok, frame = cap.read()
+                    metrics.observe("capture", time.perf_counter() - read_started)
+                    if not ok or frame is None:
+                        if is_file:
+                            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                            continue
+                        raise ConnectionError("Failed to capture frame from camera")
+
+                    now = time.monotonic()
+                    if file_interval and now - last < file_interval:
+                        time.sleep(file_interval - (now - last))
+                        now = time.monotonic()
+                    if now > last:
+                        self._fps = 0.9 * self._fps + 0.1 / (now - last)
+                    last = now
+
+                    self.connected = True
+                    self.last_error = None
+                    self.frame_size = f"{frame.shape[1]}x{frame.shape[0]}"
+                    backoff = 1.0
+                    self._publish(frame)
+
+            except Exception as e:
+                self.last_error = f"Camera error: {str(e)}"
+                metrics.count("errors_total", stage="capture")
+            finally:
+                if cap is not None:
+                    cap.release()
+
+            if self._stop.is_set():
+                break
+
+            # Reconnect with exponential backoff
+            self.connected = False
+            self.reconnects += 1
+            print(f"📷 {self.last_error}, reconnecting in {backoff:.0f}s")
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+        self.connected = False
+
+
+_streams = {}
+_streams_lock = threading.Lock()
+
+def get_camera(source):
+    """Shared, already-running stream for a camera source (one capture thread per camera)"""
+    with _streams_lock:
+        stream = _streams.get(source)
+        if stream is None:
+            stream = _streams[source] = CameraStream(source)
+        return stream.start()
+
+def find_camera(source):
+    """The stream for a source if it has been opened, without opening it"""
+    with _streams_lock:
+        return _streams.get(source)
+
+def close_camera(source):
+    """Stop a source's capture thread, if it was opened"""
+    with _streams_lock:
+        stream = _streams.pop(source, None)
+    if stream is not None:
+        stream.stop()
+
+def stop_all_cameras():
+    with _streams_lock:
+        streams = list(_streams.values())
+        _streams.clear()
+    for stream in streams:
+        stream.stop()
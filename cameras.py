@@ -0,0 +1,196 @@
+import json
+import os
+import sys
+import threading
+
+from config import CAMERAS_FILE, CAMERA_STALE_SECONDS, CAMERA_LAG_SECONDS, PIPELINE_FRAME_SKIP
+from models import Camera
+
+# Camera name used for CAMERA_SOURCE when there is no registry file
+DEFAULT_CAMERA = "default"
+
+
+def read_camera_file(path=CAMERAS_FILE):
+    """Camera entries from the JSON registry file, or [] if there is none"""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path) as f:
+        entries = json.load(f)
+    if isinstance(entries, dict):
+        entries = entries.get("cameras", [])
+    for entry in entries:
+        if not entry.get("name") or not entry.get("source"):
+            raise ValueError(f"Camera entries in {path} need a name and a source: {entry}")
+    return entries
+
+def sync_cameras(db, default_source, path=CAMERAS_FILE):
+    """Bring the cameras table in line with the registry file and return the cameras
+
+    Cameras are matched by name, so their ids (stored on attendance rows) survive
+    edits. Cameras dropped from the file are disabled rather than deleted.
+    Without a file, default_source is the single "default" camera.
+    """
+    entries = read_camera_file(path) or [{"name": DEFAULT_CAMERA, "source": default_source}]
+    existing = {c.name: c for c in db.query(Camera)}
+    listed = set()
+    for entry in entries:
+        camera = existing.get(entry["name"]) or Camera(name=entry["name"])
+        camera.source = entry["source"]
+        camera.lecture = entry.get("lecture")
+        camera.room = entry.get("room")
+        camera.enabled = bool(entry.get("enabled", True))
+        db.add(camera)
+        listed.add(entry["name"])
+    for name, camera in existing.items():
+        if name not in listed:
+            camera.enabled = False
+    db.commit()
+    return db.query(Camera).order_by(Camera.id).all()
+
+def camera_row(c):
+    return {"id": c.id, "name": c.name, "source": c.source, "lecture": c.lecture, "room": c.room, "enabled": c.enabled}
+
+def camera_health(stream_status, pipeline_status):
+    """"ok", "lagging", "stalled", "disconnected" or "off" for one camera"""
+    if stream_status is None:
+        return "off"
+    if not stream_status["connected"]:
+        return "disconnected"
+    if stream_status["frame_age"] is None or stream_status["frame_age"] > CAMERA_STALE_SECONDS:
+        return "stalled"
+    if pipeline_status and pipeline_status["running"] and pipeline_status["lag"] > CAMERA_LAG_SECONDS:
+        return "lagging"
+    return "ok"
+
+
+class CameraManager:
+    """Registered cameras, each with its own capture stream and recognition pipeline
+
+    Pipelines share the process's face models and face index; their detect and
+    embed stages take turns through the pipeline module's FairScheduler.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cameras = {}
+        self.pipelines = {}
+
+    def load(self, db, default_source):
+        """Read the registry (file → cameras table) into memory"""
+        cameras = {c.name: camera_row(c) for c in sync_cameras(db, default_source)}
+        with self._lock:
+            self.cameras = cameras
+        return list(cameras.values())
+
+    def reload(self, db, default_source):
+        """Re-read the registry and apply it to running cameras
+
+        Cameras no longer enabled stop recognizing and their capture stream and
+        video feed encoder close; enabled cameras whose source changed restart
+        their pipeline on the new stream. Returns the names restarted.
+        """
+        from camera import close_camera
+        old = dict(self.cameras)
+        self.load(db, default_source)
+        moved = [n for n, c in self.cameras.items()
+                 if c["enabled"] and n in old and old[n]["source"] != c["source"] and self.pipeline(n) is not None]
+        self.stop([n for n in self.pipelines if not (self.get(n) or {}).get("enabled")] + moved)
+
+        # Sources no enabled camera reads from any more
+        in_use = {c["source"] for c in self.enabled}
+        for source in {c["source"] for c in old.values()} - in_use:
+            if "broadcast" in sys.modules:
+                sys.modules["broadcast"].close_broadcaster(source)
+            close_camera(source)
+        self.open_streams()
+        restarted = []
+        for name in moved:
+            restarted += self.start([name], frame_skip=self.pipelines[name].frame_skip)
+        return restarted
+
+    def get(self, name):
+        return self.cameras.get(name)
+
+    @property
+    def enabled(self):
+        return [c for c in self.cameras.values() if c["enabled"]]
+
+    def default(self):
+        """The first enabled camera, which the single-camera routes use"""
+        enabled = self.enabled
+        return enabled[0] if enabled else None
+
+    def stream(self, name):
+        from camera import get_camera
+        return get_camera(self.cameras[name]["source"])
+
+    def open_streams(self):
+        """Start capturing from every enabled camera"""
+        for camera in self.enabled:
+            self.stream(camera["name"])
+
+    def pipeline(self, name):
+        pipeline = self.pipelines.get(name)
+        return pipeline if pipeline is not None and pipeline.running else None
+
+    def start(self, names=None, frame_skip=PIPELINE_FRAME_SKIP):
+        """Start recognition on the named cameras (all enabled ones by default); returns the names started"""
+        from pipeline import RecognitionPipeline
+        started = []
+        for name in names or [c["name"] for c in self.enabled]:
+            camera = self.cameras[name]
+            with self._lock:
+                if self.pipeline(name) is not None:
+                    continue
+                self.pipelines[name] = RecognitionPipeline(
+                    self.stream(name), frame_skip=frame_skip, camera=name, camera_id=camera["id"]
+                ).start()
+            started.append(name)
+        return started
+
+    def stop(self, names=None):
+        """Stop recognition on the named cameras (all by default); returns the names stopped"""
+        with self._lock:
+            pipelines = [(n, p) for n, p in self.pipelines.items() if names is None or n in names]
+        stopped = []
+        for name, pipeline in pipelines:
+            if pipeline.running:
+                pipeline.stop()
+                stopped.append(name)
+        return stopped
+
+    @property
+    def running(self):
+        return any(p.running for p in list(self.pipelines.values()))
+
+    def status(self):
+        """Per-camera capture rate, lag and health"""
+        from camera import find_camera
+        scheduler = sys.modules["pipeline"].fair_scheduler.status() if "pipeline" in sys.modules else {"cameras": {}}
+        cameras = []
+        for camera in self.cameras.values():
+            stream = find_camera(camera["source"])
+            stream_status = stream.status() if stream is not None else None
+            pipeline = self.pipelines.get(camera["name"])
+            pipeline_status = pipeline.status() if pipeline is not None else None
+            cameras.append({
+                "id": camera["id"],
+                "name": camera["name"],
+                "lecture": camera["lecture"],
+                "room": camera["room"],
+                "enabled": camera["enabled"],
+                "health": camera_health(stream_status, pipeline_status),
+                "capture_fps": stream_status["fps"] if stream_status else 0.0,
+                "frame_age": stream_status["frame_age"] if stream_status else None,
+                "recognizing": bool(pipeline_status and pipeline_status["running"]),
+                "evaluated_fps": pipeline_status["evaluated_fps"] if pipeline_status else 0.0,
+                "lag": pipeline_status["lag"] if pipeline_status else None,
+                "frames_dropped": pipeline_status["frames_dropped"] if pipeline_status else 0,
+                "cpu_share": scheduler["cameras"].get(camera["name"], {}).get("share", 0.0),
+                "last_error": (stream_status or {}).get("last_error") or (pipeline_status or {}).get("last_error"),
+            })
+        return cameras
+
+
+# Shared registry for the API process
+camera_manager = CameraManager()
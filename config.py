@@ -0,0 +1,122 @@
+import os
+
+# Folder holding enrollment images
+IMAGES_DIR = "images"
+# Aligned, fixed-size face crops used for recognition and re-indexing
+FACES_DIR = os.path.join(IMAGES_DIR, "faces")
+FACE_CROP_SIZE = int(os.getenv("FACE_CROP_SIZE", "224"))
+# Small previews for the dashboard ("jpg" or "webp")
+THUMBNAILS_DIR = os.path.join(IMAGES_DIR, "thumbs")
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "96"))
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "jpg")
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "85"))
+# Keep the uploaded photo as well (in images/originals); off by default
+KEEP_ORIGINAL_IMAGES = os.getenv("KEEP_ORIGINAL_IMAGES", "0") == "1"
+ORIGINALS_DIR = os.path.join(IMAGES_DIR, "originals")
+
+# Face recognition settings (enrollment and lookup must use the same model)
+MODEL_NAME = os.getenv("FACE_MODEL", "VGG-Face")
+DETECTOR_BACKEND = os.getenv("FACE_DETECTOR", "opencv")
+
+# Minimum cosine similarity for a match (VGG-Face cosine distance threshold is 0.68)
+MATCH_THRESHOLD = float(os.getenv("FACE_MATCH_THRESHOLD", "0.32"))
+
+# Append-only file of enrollment embeddings, replayed at startup
+INDEX_PATH = os.getenv("FACE_INDEX_PATH", os.path.join("index", "faces.idx"))
+
+# Continuous recognition pipeline: process every (FRAME_SKIP + 1)th camera frame
+PIPELINE_FRAME_SKIP = int(os.getenv("PIPELINE_FRAME_SKIP", "2"))
+# Max frames/jobs waiting between two pipeline stages
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+
+# Recognition executor: "process" (one model copy per core) or "thread"
+RECOGNITION_EXECUTOR = os.getenv("RECOGNITION_EXECUTOR", "process")
+RECOGNITION_WORKERS = int(os.getenv("RECOGNITION_WORKERS", str(os.cpu_count() or 1)))
+# Requests allowed in flight before /mark_attendance/ answers 429
+RECOGNITION_QUEUE_LIMIT = int(os.getenv("RECOGNITION_QUEUE_LIMIT", str(2 * RECOGNITION_WORKERS)))
+
+# Face tracking: a face keeps its identity while its box overlaps the previous one
+TRACKER_IOU_THRESHOLD = float(os.getenv("TRACKER_IOU_THRESHOLD", "0.3"))
+# Frames a track may go unseen before it is dropped
+TRACKER_MAX_MISSED = int(os.getenv("TRACKER_MAX_MISSED", "5"))
+# Seconds before a tracked identity is re-verified with a fresh embedding
+TRACKER_REVERIFY_SECONDS = float(os.getenv("TRACKER_REVERIFY_SECONDS", "10"))
+# Seconds a track waits for a requested embedding before it may ask again (lost or failed jobs)
+TRACKER_PENDING_SECONDS = float(os.getenv("TRACKER_PENDING_SECONDS", "30"))
+
+# Motion gate ahead of face detection: skip frames that barely changed
+MOTION_GATE_ENABLED = os.getenv("MOTION_GATE_ENABLED", "1") == "1"
+# Grayscale difference (0-255) for a pixel to count as changed
+MOTION_PIXEL_THRESHOLD = int(os.getenv("MOTION_PIXEL_THRESHOLD", "25"))
+# Fraction of changed pixels needed to let a frame through
+MOTION_AREA_THRESHOLD = float(os.getenv("MOTION_AREA_THRESHOLD", "0.01"))
+# Width frames are downscaled to before differencing
+MOTION_DOWNSCALE_WIDTH = int(os.getenv("MOTION_DOWNSCALE_WIDTH", "160"))
+
+# /mark_attendance/ result cache keyed by a perceptual hash of the frame (0 entries disables it)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+# Seconds a cached result is reused, so someone walking into a static scene is picked up
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "10"))
+# Side of the difference hash grid (side² bits) and the differing bits still treated as the same frame
+RESULT_CACHE_HASH_SIZE = int(os.getenv("RESULT_CACHE_HASH_SIZE", "16"))
+RESULT_CACHE_MAX_DISTANCE = int(os.getenv("RESULT_CACHE_MAX_DISTANCE", "6"))
+
+# Max faces (across queued frames) embedded together in one forward pass
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+
+# Write-behind attendance writer: flush after this many rows or seconds
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "100"))
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "0.5"))
+
+# Face search: "exact" scans every embedding, "ivf" only probes the closest k-means cells
+FACE_INDEX_MODE = os.getenv("FACE_INDEX_MODE", "exact")
+# IVF cells (0 = about 4·√N) and cells probed per query (higher = better recall, slower)
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+# Below this many students the exact scan is fast enough and IVF is skipped
+ANN_MIN_SIZE = int(os.getenv("ANN_MIN_SIZE", "5000"))
+# Saved IVF centroids and cell assignments, reloaded at startup without retraining
+ANN_INDEX_PATH = os.getenv("ANN_INDEX_PATH", os.path.join("index", "faces.ivf.npz"))
+
+# Memory-mapped embedding snapshot shared by every API process: "float16", "int8",
+# or "none" to keep all embeddings as resident float32 in each process. The snapshot
+# saves memory per process but dequantizes every row on each search (several times slower
+# full scans, see benchmark.py), so it is opt-in
+EMBEDDING_STORE_DTYPE = os.getenv("EMBEDDING_STORE_DTYPE", "none")
+EMBEDDING_STORE_PATH = os.getenv("EMBEDDING_STORE_PATH", os.path.join("index", "faces.emb"))
+# Log records past the snapshot that trigger a full replay and a fresh snapshot
+EMBEDDING_STORE_REFRESH_RECORDS = int(os.getenv("EMBEDDING_STORE_REFRESH_RECORDS", "1000"))
+# Seconds between checks for enrollments other processes appended to the index log (0 = never)
+EMBEDDING_LOG_POLL_SECONDS = float(os.getenv("EMBEDDING_LOG_POLL_SECONDS", "5"))
+
+# /video_feed broadcaster: frames encoded once per tick and shared by every viewer
+STREAM_FPS = float(os.getenv("STREAM_FPS", "10"))
+STREAM_JPEG_QUALITY = int(os.getenv("STREAM_JPEG_QUALITY", "70"))
+STREAM_WIDTH = int(os.getenv("STREAM_WIDTH", "640"))
+# Draw tracked faces and recognized names on the stream
+STREAM_OVERLAYS = os.getenv("STREAM_OVERLAYS", "1") == "1"
+
+# /events stream: recent recognition and attendance events kept for (re)connecting dashboards
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "1000"))
+# Seconds of silence before a keepalive comment is sent
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+# Camera registry: JSON list of {"name", "source", "lecture", "room", "enabled"}; without it
+# CAMERA_SOURCE is registered as the single "default" camera
+CAMERAS_FILE = os.getenv("CAMERAS_FILE", "cameras.json")
+# Detect/embed jobs run at once across all camera pipelines, shared fairly between cameras
+PIPELINE_SLOTS = int(os.getenv("PIPELINE_SLOTS", "2"))
+# Frames older than this mean the stream has stalled
+CAMERA_STALE_SECONDS = float(os.getenv("CAMERA_STALE_SECONDS", "5"))
+# Capture-to-result delay above which a camera pipeline is reported as lagging
+CAMERA_LAG_SECONDS = float(os.getenv("CAMERA_LAG_SECONDS", "3"))
+
+# Add a Server-Timing header with per-stage milliseconds to /mark_attendance/ responses
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "0") == "1"
+
+# Offline replay of recordings: process every Nth decoded frame, sent to the workers in
+# runs of this many sampled frames (faces are tracked within a run and embedded once)
+REPLAY_STRIDE = int(os.getenv("REPLAY_STRIDE", "25"))
+REPLAY_CHUNK_FRAMES = int(os.getenv("REPLAY_CHUNK_FRAMES", "16"))
+# Folder POST /replay reads recordings from (paths are relative to it)
+RECORDINGS_DIR = os.getenv("RECORDINGS_DIR", "recordings")
@@ -1,12 +1,30 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 # SQLite database file
 DATABASE_URL = "sqlite:///./attendance.db"
 
-# Engine setup
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# How long a connection waits on a locked database before failing (milliseconds)
+SQLITE_BUSY_TIMEOUT_MS = 5000
+
+# Engine setup: one pooled connection per concurrent reader; WAL lets them
+# read while the attendance writer thread commits
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+    pool_size=10,
+    max_overflow=20,
+    pool_pre_ping=True,
+)
+
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
 
 # Session setup
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -25,4 +43,44 @@ def get_db():
 def create_tables():
     """Create all tables if not exist."""
     from models import Student, Attendance
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    from reports import install_rollups
+    Base.metadata.create_all(bind=engine)
+    migrate_columns()
+    migrate_indexes()
+    install_rollups()
+
+def migrate_columns():
+    """Add nullable columns declared on models to tables created before they existed."""
+    from sqlalchemy import inspect, text
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                ))
+            print(f"🛠 Added column {table.name}.{column.name}")
+
+def migrate_indexes():
+    """Add indexes declared on models to tables created before they existed."""
+    from sqlalchemy import inspect, text
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.unique:
+                # Older databases may hold duplicates the new unique index would reject
+                columns = ", ".join(c.name for c in index.columns)
+                with engine.begin() as conn:
+                    removed = conn.execute(text(
+                        f"DELETE FROM {table.name} WHERE id NOT IN "
+                        f"(SELECT MIN(id) FROM {table.name} GROUP BY {columns})"
+                    )).rowcount
+                if removed:
+                    print(f"🧹 Removed {removed} duplicate rows from {table.name}")
+            index.create(bind=engine)
@@ -1,59 +1,320 @@
-
 from deepface import DeepFace
+from deepface.modules import preprocessing
+import numpy as np
 import cv2
 import os
+import time
 
-def recognize_face_from_image(image_path):
-    """Recognize face from image file path"""
-    try:
-        # Check if file exists
-        if not os.path.exists(image_path):
-            print(f"❌ File not found: {image_path}")
-            return None
+from config import (
+    MODEL_NAME, DETECTOR_BACKEND, FACE_CROP_SIZE, EMBEDDING_STORE_DTYPE, EMBEDDING_STORE_PATH, EMBEDDING_STORE_REFRESH_RECORDS
+)
+from face_index import face_index, embedding_log
+from embedding_store import EmbeddingStore
+from face_images import is_face_crop
 
-        # Try reading the image
-        img = cv2.imread(image_path)
-        if img is None:
-            print(f"❌ OpenCV failed to read image: {image_path}")
-            return None
+def detect_faces(img):
+    """Detect and align every face in an image (path or BGR array)
+
+    Returns a list of {"face": BGR float crop, "facial_area": {...}, "confidence": float}
+    dicts. The whole-image fallback DeepFace returns when nothing is detected is dropped.
+    """
+    faces = DeepFace.extract_faces(
+        img_path=img,
+        detector_backend=DETECTOR_BACKEND,
+        enforce_detection=False
+    )
+    return [
+        {"face": f["face"][:, :, ::-1], "facial_area": f["facial_area"], "confidence": f["confidence"]}
+        for f in faces
+        if f["confidence"] > 0 or DETECTOR_BACKEND == "skip"
+    ]
+
+# Whether Model.forward embeds a whole batch; found out on the first multi-face call (warm_up)
+_batched_forward = None
+
+def embed_faces(faces):
+    """Embed already detected face crops in one batched forward pass, returning an (n_faces, dim) matrix"""
+    global _batched_forward
+    if not faces:
+        return np.zeros((0, 0), dtype=np.float32)
 
-        # Run DeepFace recognition
-        result = DeepFace.find(
-            img_path=image_path,
-            db_path="images",
-            enforce_detection=False,
-            silent=True
+    model = DeepFace.build_model(MODEL_NAME)
+    # resize_image takes the model's input shape swapped, exactly as DeepFace.represent does
+    target_size = (model.input_shape[1], model.input_shape[0])
+
+    # Same resize/pad and normalization DeepFace.represent applies, stacked into one batch
+    batch = np.concatenate([
+        preprocessing.normalize_input(
+            preprocessing.resize_image(f["face"], target_size),
+            normalization="base"
         )
+        for f in faces
+    ])
+    if len(faces) == 1 or _batched_forward is not False:
+        embeddings = np.asarray(model.forward(batch), dtype=np.float32)
+        # A batch of one comes back as a flat vector
+        if embeddings.ndim == 1:
+            embeddings = embeddings.reshape(1, -1)
+        if len(faces) == 1:
+            return embeddings
+        _batched_forward = embeddings.shape[0] == len(faces)
+        if _batched_forward:
+            return embeddings
+        # Releases before batched forward return only the first face's embedding
+        print("⚠ Model.forward does not batch, embedding faces one at a time")
+    return np.stack([
+        np.asarray(model.forward(batch[i:i + 1]), dtype=np.float32).reshape(-1)
+        for i in range(len(faces))
+    ])
 
-        # DeepFace result handling
-        if isinstance(result, list) and len(result) > 0 and not result[0].empty:
-            matched_name = os.path.basename(result[0].iloc[0]['identity']).split(".")[0]
-            print(f"✅ Recognized as: {matched_name}")
-            return matched_name
-        else:
-            print("😕 No face match found.")
-            return None
+def get_enrollment_embedding(img):
+    """Embedding of the largest face in an enrollment image (stored face crops are embedded as is)"""
+    if isinstance(img, str) and is_face_crop(img):
+        crop = cv2.imread(img)
+        if crop is not None:
+            return embed_crop(crop)
+    reps = DeepFace.represent(
+        img_path=img,
+        model_name=MODEL_NAME,
+        detector_backend=DETECTOR_BACKEND,
+        enforce_detection=False,
+        max_faces=1
+    )
+    return np.array(reps[0]["embedding"], dtype=np.float32)
 
-    except Exception as e:
-        print("Face recognition error:", e)
+def face_crop(face, size=FACE_CROP_SIZE):
+    """Letterbox an aligned float face into a size × size uint8 BGR image"""
+    face = np.clip(face * 255, 0, 255).astype(np.uint8)
+    h, w = face.shape[:2]
+    scale = size / max(h, w)
+    resized = cv2.resize(face, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    crop = np.zeros((size, size, 3), dtype=np.uint8)
+    top, left = (size - resized.shape[0]) // 2, (size - resized.shape[1]) // 2
+    crop[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return crop
+
+def embed_crop(crop):
+    """Embedding of a stored face crop, with no detection pass"""
+    return embed_faces([{"face": crop.astype(np.float32) / 255.0}])[0]
+
+def prepare_enrollment(img):
+    """Detect and align the largest face of an enrollment image once
+
+    Returns (crop, embedding, None) with the fixed-size face crop and its
+    embedding, or (None, None, reason) when the image holds no face.
+    """
+    faces = detect_faces(img)
+    if not faces:
+        return None, None, "no face found"
+    largest = max(faces, key=lambda f: f["facial_area"]["w"] * f["facial_area"]["h"])
+    crop = face_crop(largest["face"])
+    return crop, embed_crop(crop), None
+
+def prepare_enrollment_from_bytes(data):
+    """prepare_enrollment for an encoded upload; picklable, so bulk enrollment runs it on the pool"""
+    img = decode_image(data)
+    if img is None:
+        return None, None, "undecodable image"
+    return prepare_enrollment(img)
+
+def open_embedding_store():
+    """Map the embedding snapshot if it was built from this log and model, else None"""
+    if EMBEDDING_STORE_DTYPE == "none":
+        return None
+    store = EmbeddingStore.open(EMBEDDING_STORE_PATH)
+    if store is None or store.model_name != MODEL_NAME[:32] or store.dtype != EMBEDDING_STORE_DTYPE:
         return None
+    if embedding_log.fingerprint(store.log_size) != store.log_crc:
+        print("⚠ Embedding store is out of date with the index log, rebuilding")
+        return None
+    return store
+
+def build_face_index(students):
+    """Load the face index, embedding only students missing from it
+
+    When the memory-mapped snapshot matches the log it is opened as is and only
+    log records written after it are applied; otherwise the whole log is replayed
+    and a fresh snapshot written.
+    """
+    enrolled = {student.id: student for student in students}
+
+    store = open_embedding_store()
+    tail, tail_records = embedding_log.replay(MODEL_NAME, start=store.log_size) if store is not None else (None, 0)
+    if tail is not None and tail_records <= EMBEDDING_STORE_REFRESH_RECORDS:
+        face_index.open_store(store)
+        embedding_log.records = store.log_records + tail_records
+        for student_id, embedding in tail.items():
+            if embedding is None:
+                face_index.remove(student_id)
+            else:
+                face_index.add(student_id, embedding)
+
+        live = set(face_index.live_ids().tolist())
+        for student_id in live - set(enrolled):
+            unenroll_student(student_id)
+        for student_id in set(enrolled) - live:
+            try:
+                enroll_student(student_id, get_enrollment_embedding(enrolled[student_id].image))
+            except Exception as e:
+                print(f"⚠ Could not embed {enrolled[student_id].image}: {e}")
+
+        face_index.build_ann()
+        print(f"✅ Face index mapped from {EMBEDDING_STORE_PATH} with {len(face_index)} students")
+        return
+
+    entries, _ = embedding_log.replay(MODEL_NAME)
+    if entries is None:
+        entries = {}
+        embedding_log.rewrite(entries, MODEL_NAME)
+
+    # Students removed from the database since the last run
+    for student_id in [sid for sid in entries if sid not in enrolled]:
+        embedding_log.delete(student_id, MODEL_NAME)
+        del entries[student_id]
+
+    # Students enrolled before the log existed (or whose embedding failed)
+    for student in students:
+        if student.id in entries:
+            continue
+        try:
+            entries[student.id] = get_enrollment_embedding(student.image)
+            embedding_log.append(student.id, entries[student.id], MODEL_NAME)
+        except Exception as e:
+            print(f"⚠ Could not embed {student.image}: {e}")
+
+    # Compact once replaced/deleted records outnumber live ones
+    if embedding_log.records > 2 * max(len(entries), 1):
+        embedding_log.rewrite(entries, MODEL_NAME)
+
+    if EMBEDDING_STORE_DTYPE == "none":
+        face_index.load(list(entries.keys()), list(entries.values()))
+    else:
+        store = EmbeddingStore.write(
+            EMBEDDING_STORE_PATH, list(entries.keys()), list(entries.values()), MODEL_NAME, EMBEDDING_STORE_DTYPE,
+            embedding_log.size(), embedding_log.records, embedding_log.fingerprint()
+        )
+        face_index.open_store(store)
+    face_index.build_ann()
+    print(f"✅ Face index loaded with {len(face_index)} students")
+
+def refresh_face_index():
+    """Apply log records other processes wrote (e.g. the bulk enrollment CLI); returns how many"""
+    if not embedding_log.moved():
+        return 0
+    position = embedding_log.position
+    if embedding_log.size() > position and embedding_log.fingerprint(position) == embedding_log.position_fingerprint:
+        tail, records = embedding_log.replay(MODEL_NAME, start=position, repair=False)
+        if tail is None:
+            return 0
+        for student_id, embedding in tail.items():
+            if embedding is None:
+                face_index.remove(student_id)
+            else:
+                face_index.add(student_id, embedding)
+        embedding_log.records += records
+    else:
+        # Compacted by another process: reload every embedding
+        entries, records = embedding_log.replay(MODEL_NAME, repair=False)
+        if entries is None:
+            return 0
+        face_index.load(list(entries.keys()), list(entries.values()))
+        face_index.build_ann()
+    if records:
+        print(f"🔄 Face index picked up {records} log records from another process")
+    return records
+
+def enroll_student(student_id, embedding):
+    """Persist a student's enrollment embedding and make it searchable (replaces any earlier one)"""
+    embedding_log.append(student_id, embedding, MODEL_NAME)
+    face_index.add(student_id, embedding)
+
+def unenroll_student(student_id):
+    """Remove a student from the persisted and resident index"""
+    embedding_log.delete(student_id, MODEL_NAME)
+    face_index.remove(student_id)
+
+def preload_models():
+    """Load the detector and recognizer once (used as the worker-process initializer)"""
+    DeepFace.build_model(MODEL_NAME)
+    if DETECTOR_BACKEND != "skip":
+        # task= needs deepface 0.0.93+ (see requirements.txt); older releases only build recognizers
+        DeepFace.build_model(DETECTOR_BACKEND, task="face_detector")
+
+def warm_up():
+    """Run one dummy detection and embedding so graph building happens before the first request"""
+    dummy = np.zeros((224, 224, 3), dtype=np.uint8)
+    detect_faces(dummy)
+    # Two faces, so the batched forward probe runs here rather than on a live frame
+    embed_faces([{"face": dummy.astype(np.float32)}] * 2)
+
+def init_worker():
+    """Worker-process initializer: load and warm up the models once per worker"""
+    preload_models()
+    warm_up()
+
+def embed_image(img):
+    """Detect every face in an image and return their embeddings as an (n_faces, dim) matrix"""
+    return embed_faces(detect_faces(img))
+
+def embed_image_timed(img):
+    """embed_image plus {"detect": seconds, "embed": seconds}, for callers in another process"""
+    started = time.perf_counter()
+    faces = detect_faces(img)
+    detected = time.perf_counter()
+    embeddings = embed_faces(faces)
+    return embeddings, {"detect": detected - started, "embed": time.perf_counter() - detected}
+
+def recognize_faces(img):
+    """Return the matched student id (or None) for every face in an image"""
+    embeddings = embed_image(img)
+    if len(embeddings) == 0:
+        return []
+    return face_index.match(embeddings)
+
+def decode_image(data):
+    """Decode encoded image bytes (JPEG/PNG upload buffer) straight into a BGR array"""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+def recognize_face_from_image(image_path):
+    """Recognize face from image file path and return the matched student id"""
+    # Check if file exists
+    if not os.path.exists(image_path):
+        print(f"❌ File not found: {image_path}")
+        return None
+
+    # Try reading the image
+    img = cv2.imread(image_path)
+    if img is None:
+        print(f"❌ OpenCV failed to read image: {image_path}")
+        return None
+
+    return recognize_face_from_frame(img)
+
+def recognize_face_from_bytes(data):
+    """Recognize face from encoded image bytes without touching disk"""
+    img = decode_image(data)
+    if img is None:
+        print("❌ OpenCV failed to decode image bytes")
+        return None
+
+    return recognize_face_from_frame(img)
 
 def recognize_face_from_frame(frame):
-    """Recognize face from OpenCV frame"""
+    """Recognize face from an OpenCV BGR frame and return the matched student id"""
     try:
-        # Save frame temporarily
-        temp_path = "temp_frame.jpg"
-        cv2.imwrite(temp_path, frame)
-        
-        # Use existing function
-        result = recognize_face_from_image(temp_path)
-        
-        # Clean up
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-            
-        return result
-        
+        # Match against the resident face index
+        matches = [m for m in recognize_faces(frame) if m is not None]
+
+        if matches:
+            print(f"✅ Recognized student id: {matches[0]}")
+            return matches[0]
+        else:
+            print("😕 No face match found.")
+            return None
+
     except Exception as e:
         print("Frame recognition error:", e)
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,143 @@
+import os
+import struct
+import numpy as np
+
+
+class EmbeddingStore:
+    """Read-only, memory-mapped snapshot of enrollment embeddings
+
+    Layout: a fixed header (magic, dtype, count, dim, the embedding log position
+    it was built from, model name), sorted int64 student ids, float32 per-row
+    scales (int8 only), then count × dim unit vectors as float16 or int8.
+    Opening only maps the file, so every process shares the same page-cache
+    pages and nothing is loaded per process.
+    """
+
+    MAGIC = b"FEMB1"
+    # magic, dtype code, count, dim, log size, log records, log tail crc, model name
+    HEADER = struct.Struct("<5sBIIQQI32s")
+    HEADER_SIZE = 128
+    DTYPES = {"float16": (1, np.float16), "int8": (2, np.int8)}
+    # Dequantized float32 rows materialized at a time while scanning
+    BLOCK_BYTES = 16 * 1024 * 1024
+
+    def __init__(self, path, dtype, ids, scales, vectors, model_name, log_size, log_records, log_crc):
+        self.path = path
+        self.dtype = dtype
+        self.ids = ids
+        self.scales = scales
+        self.vectors = vectors
+        self.model_name = model_name
+        self.log_size = log_size
+        self.log_records = log_records
+        self.log_crc = log_crc
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    @property
+    def block_rows(self):
+        return max(1, self.BLOCK_BYTES // (4 * max(self.dim, 1)))
+
+    @classmethod
+    def open(cls, path):
+        """Map a store file, or return None if it is missing or unreadable"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                header = f.read(cls.HEADER_SIZE)
+            magic, code, count, dim, log_size, log_records, log_crc, model = cls.HEADER.unpack_from(header)
+            dtype = next((name for name, (c, _) in cls.DTYPES.items() if c == code), None)
+            if magic != cls.MAGIC or dtype is None:
+                raise ValueError("not an embedding store")
+
+            offset = cls.HEADER_SIZE
+            ids = cls._map(path, np.int64, offset, (count,))
+            offset += 8 * count
+            scales = None
+            if dtype == "int8":
+                scales = cls._map(path, np.float32, offset, (count,))
+                offset += 4 * count
+            vectors = cls._map(path, cls.DTYPES[dtype][1], offset, (count, dim))
+        except (OSError, ValueError, struct.error) as e:
+            print(f"⚠ Ignoring unreadable embedding store {path}: {e}")
+            return None
+        return cls(path, dtype, ids, scales, vectors, model.rstrip(b"\0").decode(), log_size, log_records, log_crc)
+
+    @staticmethod
+    def _map(path, dtype, offset, shape):
+        if 0 in shape:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+    @classmethod
+    def write(cls, path, student_ids, embeddings, model_name, dtype="float16", log_size=0, log_records=0, log_crc=0):
+        """Quantize L2-normalized embeddings into a new store file (atomically) and open it"""
+        if dtype not in cls.DTYPES:
+            raise ValueError(f"Unknown embedding store dtype: {dtype}")
+        ids = np.asarray(student_ids, dtype=np.int64)
+        order = np.argsort(ids)
+        ids = ids[order]
+        if len(ids):
+            vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)[order]
+        else:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+
+        scales = None
+        if dtype == "int8":
+            # Symmetric per-row scale: the largest component maps to ±127
+            scales = np.abs(vectors).max(axis=1, initial=0.0) / 127.0
+            scales[scales == 0] = 1.0
+            vectors = np.round(vectors / scales[:, None]).astype(np.int8)
+            scales = scales.astype(np.float32)
+        else:
+            vectors = vectors.astype(np.float16)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            header = cls.HEADER.pack(cls.MAGIC, cls.DTYPES[dtype][0], len(ids), vectors.shape[1] if len(ids) else 0,
+                                     log_size, log_records, log_crc, model_name.encode()[:32])
+            f.write(header.ljust(cls.HEADER_SIZE, b"\0"))
+            f.write(ids.tobytes())
+            if scales is not None:
+                f.write(scales.tobytes())
+            f.write(vectors.tobytes())
+        os.replace(tmp_path, path)
+        return cls.open(path)
+
+    def position(self, student_id):
+        """Row of a student in the store, or None"""
+        pos = int(np.searchsorted(self.ids, student_id))
+        if pos < len(self.ids) and self.ids[pos] == student_id:
+            return pos
+        return None
+
+    def dot(self, queries, start, end):
+        """Similarities of float32 queries with rows start:end, computed from the quantized rows"""
+        scores = queries @ self.vectors[start:end].astype(np.float32).T
+        if self.scales is not None:
+            scores *= self.scales[start:end]
+        return scores
+
+    def dot_rows(self, queries, rows):
+        """Similarities of float32 queries with the given (sorted) rows"""
+        scores = queries @ self.vectors[rows].astype(np.float32).T
+        if self.scales is not None:
+            scores *= self.scales[rows]
+        return scores
+
+    def take(self, rows):
+        """Dequantized float32 copies of the given rows"""
+        vectors = self.vectors[rows].astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows][:, None]
+        return vectors
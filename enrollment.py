@@ -0,0 +1,217 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+
+from models import Student
+from face_images import save_face_images, remove_face_images
+
+# Columns a bulk enrollment CSV must provide ("image" names the photo in the ZIP/folder)
+CSV_FIELDS = ["name", "roll_no", "course", "batch", "lecture", "image"]
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+class ImageSource:
+    """Enrollment photos looked up by file name in a ZIP archive or a folder"""
+
+    def __init__(self, zip_data=None, folder=None):
+        self._folder = folder
+        self._zip = None
+        if zip_data is not None:
+            try:
+                self._zip = zipfile.ZipFile(io.BytesIO(zip_data))
+            except zipfile.BadZipFile:
+                raise ValueError("Images must be uploaded as a ZIP archive")
+            names = [n for n in self._zip.namelist() if not n.endswith("/")]
+        else:
+            names = [
+                os.path.relpath(os.path.join(root, f), folder)
+                for root, _, files in os.walk(folder) for f in files
+            ]
+        # Match on the base name, case-insensitively, so nesting inside the archive doesn't matter
+        self._paths = {}
+        for name in names:
+            self._paths.setdefault(os.path.basename(name).lower(), name)
+
+    def find(self, filename):
+        return self._paths.get(os.path.basename(filename).lower())
+
+    def read(self, path):
+        if self._zip is not None:
+            return self._zip.read(path)
+        with open(os.path.join(self._folder, path), "rb") as f:
+            return f.read()
+
+
+def read_csv(data):
+    """Parse CSV bytes or text into row dicts, raising ValueError if a column is missing"""
+    text = data.decode("utf-8-sig") if isinstance(data, bytes) else data
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [f for f in CSV_FIELDS if f not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+    return [{f: (row.get(f) or "").strip() for f in CSV_FIELDS} for row in reader]
+
+def validate_rows(db, rows, images):
+    """Check every row and read its photo
+
+    Returns (report, candidates): one report entry per CSV row, and
+    (entry, row, image bytes) for each row that still needs an embedding.
+    """
+    existing_names = {name for (name,) in db.query(Student.name)}
+    existing_rolls = {roll for (roll,) in db.query(Student.roll_no)}
+    seen_names, seen_rolls = set(), set()
+    report, candidates = [], []
+
+    # Line 1 is the header
+    for line, row in enumerate(rows, start=2):
+        entry = {"row": line, "name": row["name"], "roll_no": row["roll_no"], "status": "ok"}
+        report.append(entry)
+
+        empty = [f for f in CSV_FIELDS if not row[f]]
+        if empty:
+            entry.update(status="invalid", detail=f"empty {', '.join(empty)}")
+            continue
+        if row["name"] in existing_names or row["roll_no"] in existing_rolls:
+            entry.update(status="duplicate", detail="name or roll number already enrolled")
+            continue
+        if row["name"] in seen_names or row["roll_no"] in seen_rolls:
+            entry.update(status="duplicate", detail="name or roll number repeated in CSV")
+            continue
+        seen_names.add(row["name"])
+        seen_rolls.add(row["roll_no"])
+
+        if not row["image"].lower().endswith(IMAGE_EXTENSIONS):
+            entry.update(status="invalid", detail="only JPG, JPEG and PNG images are allowed")
+            continue
+        path = images.find(row["image"])
+        if path is None:
+            entry.update(status="missing image", detail=row["image"])
+            continue
+        candidates.append((entry, row, images.read(path)))
+
+    return report, candidates
+
+def embed_upload(data):
+    """(face crop, embedding, error) for one photo; runs on the worker pool and never raises"""
+    try:
+        from detect import prepare_enrollment_from_bytes
+        return prepare_enrollment_from_bytes(data)
+    except Exception as e:
+        return None, None, f"error: {str(e)}"
+
+def enroll_rows(db, candidates, results):
+    """Save face images and insert every embedded row in one transaction, then index them
+
+    results holds (face crop, embedding, error) per candidate. If the transaction
+    fails nothing is inserted and the saved images are removed again.
+    """
+    from detect import enroll_student
+
+    pending = []
+    for (entry, row, data), (crop, embedding, error) in zip(candidates, results):
+        if error:
+            entry["status"] = error
+            continue
+        pending.append((entry, row, data, crop, embedding))
+
+    students, written = [], []
+    try:
+        for _, row, data, crop, _ in pending:
+            file_path = save_face_images(row["name"], crop, data, os.path.splitext(row["image"])[1].lower())
+            written.append(file_path)
+            students.append(Student(
+                name=row["name"],
+                roll_no=row["roll_no"],
+                course=row["course"],
+                batch=row["batch"],
+                lecture=row["lecture"],
+                image=file_path,
+            ))
+        db.add_all(students)
+        db.commit()
+    except Exception:
+        db.rollback()
+        for file_path in written:
+            remove_face_images(file_path)
+        raise
+
+    for (entry, _, _, _, embedding), student in zip(pending, students):
+        enroll_student(student.id, embedding)
+        entry["student_id"] = student.id
+    return students
+
+def summarize(report, started):
+    """Totals, throughput and the per-row report of one bulk enrollment"""
+    elapsed = time.perf_counter() - started
+    statuses = {}
+    for entry in report:
+        statuses[entry["status"]] = statuses.get(entry["status"], 0) + 1
+    enrolled = statuses.get("ok", 0)
+    return {
+        "rows": len(report),
+        "enrolled": enrolled,
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "students_per_second": round(enrolled / elapsed, 2) if elapsed else 0.0,
+        "report": report,
+    }
+
+
+if __name__ == "__main__":
+    # python enrollment.py students.csv photos.zip|photos_folder [--workers N] [--report out.json]
+    # A running API server picks these enrollments up from the index log within EMBEDDING_LOG_POLL_SECONDS
+    import asyncio
+    from config import RECOGNITION_WORKERS
+    from executor import RecognitionExecutor
+    from database import create_tables, SessionLocal
+
+    parser = argparse.ArgumentParser(description="Bulk-enroll students from a CSV and a ZIP or folder of photos")
+    parser.add_argument("csv_path")
+    parser.add_argument("images", help="ZIP archive or folder holding the photos named in the CSV")
+    parser.add_argument("--workers", type=int, default=RECOGNITION_WORKERS)
+    parser.add_argument("--report", help="write the full per-row report as JSON to this file")
+    args = parser.parse_args()
+
+    create_tables()
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        with open(args.csv_path, "rb") as f:
+            rows = read_csv(f.read())
+        if os.path.isdir(args.images):
+            images = ImageSource(folder=args.images)
+        else:
+            with open(args.images, "rb") as f:
+                images = ImageSource(zip_data=f.read())
+
+        report, candidates = validate_rows(db, rows, images)
+        print(f"📋 {len(rows)} rows, {len(candidates)} to embed on {args.workers} workers")
+
+        from detect import init_worker
+        executor = RecognitionExecutor("process", args.workers, initializer=init_worker).start()
+        try:
+            results = asyncio.run(executor.map(embed_upload, [data for _, _, data in candidates]))
+        finally:
+            executor.shutdown()
+
+        enroll_rows(db, candidates, results)
+        summary = summarize(report, started)
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    for entry in summary["report"]:
+        if entry["status"] != "ok":
+            print(f"⚠ Row {entry['row']} ({entry['name']}): {entry['status']} {entry.get('detail', '')}".rstrip())
+    print(f"✅ Enrolled {summary['enrolled']}/{summary['rows']} students in {summary['seconds']}s "
+          f"({summary['students_per_second']} students/s)")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=2)
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from config import EVENT_BUFFER_SIZE, EVENT_HEARTBEAT_SECONDS
+from subscribers import Subscribers
+
+
+class EventBus:
+    """Recognition and attendance events fanned out to live dashboards
+
+    Publishers (pipeline, request and writer threads) append to one ring buffer
+    and never block. Each subscriber is an async generator that reads from its
+    last event id, so a reconnecting client resumes where it left off and a slow
+    one only loses events once it falls a whole buffer behind.
+    """
+
+    # How often a subscriber checks for new events
+    POLL_INTERVAL = 0.1
+    # A subscriber that has not polled this long is considered gone
+    SUBSCRIBER_TIMEOUT = 2.0
+
+    def __init__(self, size=EVENT_BUFFER_SIZE, heartbeat=EVENT_HEARTBEAT_SECONDS):
+        self.heartbeat = heartbeat
+        self._events = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._subscribers = Subscribers(self.SUBSCRIBER_TIMEOUT)
+        self.published = 0
+        self.delivered = 0
+        self.missed = 0
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def publish(self, event_type, **data):
+        """Append an event and return it; safe to call from any thread"""
+        with self._lock:
+            self._seq += 1
+            event = {"id": self._seq, "type": event_type, "time": datetime.now().isoformat(timespec="milliseconds"), **data}
+            self._events.append(event)
+            self.published += 1
+        return event
+
+    def since(self, last_id):
+        """Events after last_id, and how many of them already fell out of the buffer"""
+        with self._lock:
+            if not self._events or self._events[-1]["id"] <= last_id:
+                return [], 0
+            first = self._events[0]["id"]
+            skipped = max(0, first - last_id - 1)
+            return list(self._events)[max(0, last_id - first + 1):], skipped
+
+    async def stream(self, last_id=None, types=None, camera=None, batch=None):
+        """Server-Sent Events for one subscriber, optionally filtered
+
+        Without last_id the stream starts at the next event published.
+        """
+        token = self._subscribers.join()
+        last_id = self._seq if last_id is None else last_id
+        last_sent = time.monotonic()
+        try:
+            # Tell EventSource how soon to reconnect after a dropped connection
+            yield "retry: 1000\n\n"
+            while True:
+                self._subscribers.touch(token)
+                events, skipped = self.since(last_id)
+                if skipped:
+                    self.missed += skipped
+                    yield f"event: missed\ndata: {json.dumps({'count': skipped})}\n\n"
+                    last_sent = time.monotonic()
+
+                for event in events:
+                    last_id = event["id"]
+                    if not matches(event, types, camera, batch):
+                        continue
+                    self.delivered += 1
+                    yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                    last_sent = time.monotonic()
+
+                # Comment line keeps proxies from closing an idle connection
+                if time.monotonic() - last_sent > self.heartbeat:
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+                await asyncio.sleep(self.POLL_INTERVAL)
+        finally:
+            self._subscribers.leave(token)
+
+    def status(self):
+        return {
+            "subscribers": self.subscribers,
+            "last_id": self._seq,
+            "buffered": len(self._events),
+            "published": self.published,
+            "delivered": self.delivered,
+            "missed": self.missed,
+        }
+
+
+def matches(event, types=None, camera=None, batch=None):
+    """Whether an event passes a subscriber's type, camera and batch filters"""
+    if types and event["type"] not in types:
+        return False
+    if camera and event.get("camera") != camera:
+        return False
+    if batch and batch not in event.get("batches", ()):
+        return False
+    return True
+
+
+# Shared bus for the API process
+event_bus = EventBus()
@@ -0,0 +1,138 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import RECOGNITION_EXECUTOR, RECOGNITION_WORKERS, RECOGNITION_QUEUE_LIMIT
+
+
+class ExecutorSaturated(Exception):
+    """Raised when the recognition queue limit is reached (maps to HTTP 429)"""
+
+
+class ExecutorUnavailable(Exception):
+    """Raised when the worker pool is not running or has crashed (maps to HTTP 503)"""
+
+
+class RecognitionExecutor:
+    """Runs blocking recognition work off the asyncio event loop
+
+    "process" mode gives every core its own interpreter with the models preloaded
+    by the initializer; "thread" mode shares one model copy inside this process.
+    """
+
+    def __init__(self, kind=RECOGNITION_EXECUTOR, workers=RECOGNITION_WORKERS,
+                 queue_limit=RECOGNITION_QUEUE_LIMIT, initializer=None):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.queue_limit = max(1, queue_limit)
+        self.initializer = initializer
+        self._pool = None
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def start(self):
+        if self._pool is not None:
+            return self
+        if self.kind == "process":
+            # TensorFlow is not fork-safe, so workers start from a clean interpreter
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self.initializer
+            )
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="recognition",
+                initializer=self.initializer
+            )
+        return self
+
+    def warm_up(self, fn):
+        """Call fn once per worker so every process is spawned and initialized before traffic"""
+        if self._pool is None:
+            raise ExecutorUnavailable("Recognition workers are not running")
+        futures = [self._pool.submit(fn) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn, *args):
+        """Submit fn(*args) to the pool and await it without blocking the event loop"""
+        if self._pool is None:
+            raise ExecutorUnavailable("Recognition workers are not running")
+        if self._pending >= self.queue_limit:
+            self.rejected += 1
+            raise ExecutorSaturated("Recognition queue is full")
+
+        pool = self._pool
+        self._pending += 1
+        try:
+            future = pool.submit(fn, *args)
+            result = await asyncio.wrap_future(future)
+            self.completed += 1
+            return result
+        except BrokenProcessPool:
+            # Replace the dead pool (once) so later requests can succeed again
+            if self._pool is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+                self.start()
+            raise ExecutorUnavailable("Recognition worker crashed")
+        finally:
+            self._pending -= 1
+
+    async def map(self, fn, items):
+        """Run fn over every item on the pool, one call in flight per worker, results in order
+
+        Meant for batch jobs such as bulk enrollment: calls bypass the queue limit
+        but never hold more than one slot per worker, so live requests interleave.
+        """
+        if self._pool is None:
+            raise ExecutorUnavailable("Recognition workers are not running")
+        pool = self._pool
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def call(item):
+            async with semaphore:
+                return await asyncio.wrap_future(pool.submit(fn, item))
+
+        try:
+            results = await asyncio.gather(*(call(item) for item in items))
+        except BrokenProcessPool:
+            if self._pool is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+                self.start()
+            raise ExecutorUnavailable("Recognition worker crashed")
+        self.completed += len(results)
+        return results
+
+    def submit(self, fn, *args):
+        """Submit fn(*args) from a plain thread (background jobs such as replays)
+
+        Returns a concurrent.futures.Future. Like map, this bypasses the queue
+        limit, so callers bound their own number of calls in flight.
+        """
+        if self._pool is None:
+            raise ExecutorUnavailable("Recognition workers are not running")
+        return self._pool.submit(fn, *args)
+
+    def status(self):
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "running": self._pool is not None,
+            "pending": self._pending,
+            "queue_limit": self.queue_limit,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
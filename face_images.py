@@ -0,0 +1,100 @@
+import os
+import shutil
+import sys
+
+from config import (
+    IMAGES_DIR, FACES_DIR, THUMBNAILS_DIR, THUMBNAIL_SIZE, THUMBNAIL_FORMAT, THUMBNAIL_QUALITY,
+    KEEP_ORIGINAL_IMAGES, ORIGINALS_DIR
+)
+
+
+def is_face_crop(image_path):
+    """True for images written by the enrollment preprocessing (already cropped and aligned)"""
+    return os.path.abspath(os.path.dirname(image_path)) == os.path.abspath(FACES_DIR)
+
+def thumbnail_path(image_path):
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(THUMBNAILS_DIR, f"{stem}.{THUMBNAIL_FORMAT}")
+
+def image_url(path):
+    """URL of a file under the /images mount"""
+    return "/images/" + os.path.relpath(path, IMAGES_DIR).replace(os.sep, "/")
+
+def save_face_images(name, crop, original=None, original_ext=None):
+    """Write a student's face crop and thumbnail (plus the original upload if configured)
+
+    Returns the crop path, which is what Student.image points to.
+    """
+    import cv2
+
+    os.makedirs(FACES_DIR, exist_ok=True)
+    os.makedirs(THUMBNAILS_DIR, exist_ok=True)
+
+    # PNG so re-indexing reads back exactly the pixels embedded at enrollment
+    face_path = os.path.join(FACES_DIR, f"{name}.png")
+    if not cv2.imwrite(face_path, crop):
+        raise ValueError(f"Could not write face image {face_path}")
+
+    thumbnail = cv2.resize(crop, (THUMBNAIL_SIZE, THUMBNAIL_SIZE), interpolation=cv2.INTER_AREA)
+    quality_flag = cv2.IMWRITE_WEBP_QUALITY if THUMBNAIL_FORMAT == "webp" else cv2.IMWRITE_JPEG_QUALITY
+    cv2.imwrite(thumbnail_path(face_path), thumbnail, [quality_flag, THUMBNAIL_QUALITY])
+
+    if KEEP_ORIGINAL_IMAGES and original is not None:
+        os.makedirs(ORIGINALS_DIR, exist_ok=True)
+        with open(os.path.join(ORIGINALS_DIR, f"{name}{original_ext or '.jpg'}"), "wb") as f:
+            f.write(original)
+
+    return face_path
+
+def remove_face_images(image_path):
+    """Delete a student's stored image and, for face crops, its thumbnail"""
+    paths = [image_path]
+    if is_face_crop(image_path):
+        paths.append(thumbnail_path(image_path))
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def migrate_students(db):
+    """Replace full-size enrollment photos of existing students with face crops and thumbnails"""
+    from detect import prepare_enrollment, enroll_student
+    from models import Student
+
+    converted, failed = 0, 0
+    for student in db.query(Student).all():
+        if is_face_crop(student.image):
+            continue
+        crop, embedding, error = prepare_enrollment(student.image) if os.path.exists(student.image) else (None, None, "missing file")
+        if error:
+            print(f"⚠ {student.name}: {error}, keeping {student.image}")
+            failed += 1
+            continue
+
+        original = student.image
+        student.image = save_face_images(student.name, crop)
+        db.commit()
+        enroll_student(student.id, embedding)
+        if KEEP_ORIGINAL_IMAGES:
+            os.makedirs(ORIGINALS_DIR, exist_ok=True)
+            shutil.move(original, os.path.join(ORIGINALS_DIR, os.path.basename(original)))
+        else:
+            os.remove(original)
+        converted += 1
+
+    print(f"✅ Converted {converted} students to face crops ({failed} left unchanged)")
+    return converted, failed
+
+
+if __name__ == "__main__":
+    # python face_images.py migrate
+    if sys.argv[1:] != ["migrate"]:
+        print("Usage: python face_images.py migrate")
+        sys.exit(1)
+    from database import create_tables, SessionLocal
+    create_tables()
+    db = SessionLocal()
+    try:
+        migrate_students(db)
+    finally:
+        db.close()
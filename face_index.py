@@ -0,0 +1,462 @@
+import os
+import struct
+import threading
+import zlib
+import numpy as np
+
+from config import (
+    MATCH_THRESHOLD, INDEX_PATH, FACE_INDEX_MODE, ANN_NLIST, ANN_NPROBE, ANN_MIN_SIZE, ANN_INDEX_PATH
+)
+from ann import IVFIndex
+from metrics import metrics
+
+
+def l2_normalize(vectors):
+    """L2-normalize a vector or each row of a matrix"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class FaceIndex:
+    """Face embeddings searched by cosine similarity, each row tagged with a student id
+
+    Rows live in two segments: an optional EmbeddingStore snapshot (quantized,
+    memory-mapped and shared by every process through the page cache) and a
+    resident float32 segment for students enrolled since. Removing or replacing
+    a student hides their snapshot row. In "ivf" mode every row also carries
+    its IVF cell, and searches only score rows in the cells closest to the query.
+    """
+
+    def __init__(self, mode=FACE_INDEX_MODE, nlist=ANN_NLIST, nprobe=ANN_NPROBE, min_size=ANN_MIN_SIZE):
+        if mode not in ("exact", "ivf"):
+            raise ValueError(f"Unknown face index mode: {mode}")
+        self.mode = mode
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_size = min_size
+        self._lock = threading.Lock()
+        self._store = None
+        self._store_alive = np.zeros(0, dtype=bool)
+        self._store_lists = np.zeros(0, dtype=np.int32)
+        self._store_live = 0
+        # Rows beyond _size are spare capacity so appends stay amortized O(1)
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._lists = np.zeros(0, dtype=np.int32)
+        self._size = 0
+        self._ann = None
+        # Bumped on every change to the searchable students, so cached matches can tell they are stale
+        self.version = 0
+
+    def __len__(self):
+        return self._store_live + self._size
+
+    def __contains__(self, student_id):
+        if np.any(self.student_ids == student_id):
+            return True
+        pos = self._store.position(student_id) if self._store is not None else None
+        return pos is not None and bool(self._store_alive[pos])
+
+    @property
+    def embeddings(self):
+        """Resident (float32) rows"""
+        return self._matrix[:self._size]
+
+    @property
+    def student_ids(self):
+        """Student ids of the resident rows"""
+        return self._ids[:self._size]
+
+    def live_ids(self):
+        """Ids of every searchable student"""
+        with self._lock:
+            store_ids = self._store.ids[self._store_alive] if self._store is not None else np.zeros(0, dtype=np.int64)
+            return np.concatenate([store_ids, self.student_ids])
+
+    def load(self, student_ids, embeddings):
+        """Replace the whole index with the given ids and embeddings, held in memory"""
+        embeddings = l2_normalize(embeddings) if len(student_ids) else np.zeros((0, 0), dtype=np.float32)
+        with self._lock:
+            self._reset_store(None)
+            self._matrix = embeddings
+            self._ids = np.asarray(student_ids, dtype=np.int64)
+            self._lists = np.zeros(len(self._ids), dtype=np.int32)
+            self._size = len(self._ids)
+            self._ann = None
+            self.version += 1
+
+    def open_store(self, store):
+        """Replace the whole index with a memory-mapped embedding store snapshot"""
+        with self._lock:
+            self._reset_store(store)
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+            self._ids = np.zeros(0, dtype=np.int64)
+            self._lists = np.zeros(0, dtype=np.int32)
+            self._size = 0
+            self._ann = None
+            self.version += 1
+
+    def _reset_store(self, store):
+        count = len(store) if store is not None else 0
+        self._store = store
+        self._store_alive = np.ones(count, dtype=bool)
+        self._store_lists = np.zeros(count, dtype=np.int32)
+        self._store_live = count
+
+    def _rows(self, store, resident, rows):
+        # Float32 copies of rows numbered across both segments (store rows first)
+        store_count = len(store) if store is not None else 0
+        rows = np.sort(rows)
+        split = np.searchsorted(rows, store_count)
+        parts = [store.take(rows[:split])] if split else []
+        if split < len(rows):
+            parts.append(resident[rows[split:] - store_count])
+        return np.concatenate(parts)
+
+    def _assign_all(self, ann, store, resident):
+        # IVF cell of every row across both segments, scanning the store block by block
+        parts = []
+        if store is not None:
+            for start in range(0, len(store), store.block_rows):
+                parts.append(ann.assign(store.take(np.arange(start, min(start + store.block_rows, len(store))))))
+        parts.append(ann.assign(resident) if len(resident) else np.zeros(0, dtype=np.int32))
+        return np.concatenate(parts).astype(np.int32)
+
+    def build_ann(self, path=ANN_INDEX_PATH):
+        """Load (or train and save) the IVF partition for the current embeddings"""
+        with self._lock:
+            store, alive, resident, resident_ids = self._store, self._store_alive, self.embeddings, self.student_ids
+        if self.mode != "ivf" or len(self) < self.min_size:
+            return
+        store_ids = store.ids if store is not None else np.zeros(0, dtype=np.int64)
+        all_ids = np.concatenate([store_ids, resident_ids])
+        live = np.concatenate([alive, np.ones(len(resident_ids), dtype=bool)])
+        dim = store.dim if store is not None else resident.shape[1]
+
+        ann, lists = None, None
+        saved = IVFIndex.load(path, self.nprobe)
+        if saved is not None:
+            ann, saved_ids, _ = saved
+            # Retrain once the index has more than doubled since the cells were fitted
+            if ann.dim != dim or 2 * len(saved_ids) < len(self):
+                ann = None
+            else:
+                # Saved cells go stale when a student is re-enrolled, so every row is
+                # reassigned (one matmul against the centroids); only training is skipped
+                lists = self._assign_all(ann, store, resident)
+
+        if ann is None:
+            ann = IVFIndex.for_size(len(self), self.nlist, self.nprobe)
+            rng = np.random.default_rng(0)
+            live_rows = np.flatnonzero(live)
+            sample = rng.choice(live_rows, min(len(live_rows), ann.SAMPLES_PER_LIST * ann.nlist), replace=False)
+            ann.train(self._rows(store, resident, sample))
+            lists = self._assign_all(ann, store, resident)
+            print(f"✅ Trained IVF face index: {ann.nlist} cells, nprobe={ann.nprobe}")
+        ann.save(path, all_ids[live], lists[live])
+
+        store_count = len(store_ids)
+        with self._lock:
+            if self._store is not store:
+                return
+            resident_lists = lists[store_count:]
+            # Rows enrolled (or removed) while the cells were built
+            if self._size < len(resident_lists) or not np.array_equal(self._ids[:len(resident_lists)], resident_ids):
+                resident_lists = ann.assign(self._matrix[:self._size]) if self._size else resident_lists[:0]
+            elif self._size > len(resident_lists):
+                resident_lists = np.concatenate([resident_lists, ann.assign(self._matrix[len(resident_lists):self._size])])
+            self._store_lists = lists[:store_count]
+            self._lists = np.zeros(len(self._ids), dtype=np.int32)
+            self._lists[:self._size] = resident_lists[:self._size]
+            self._ann = ann
+
+    def add(self, student_id, embedding):
+        """Add (or replace) the embedding of one student"""
+        vector = l2_normalize(embedding).reshape(-1)
+        with self._lock:
+            self._hide(student_id)
+            if self._size == len(self._ids) or self._matrix.shape[1] != len(vector):
+                self._grow(len(vector))
+            # Write the row before publishing it through _size
+            self._matrix[self._size] = vector
+            self._ids[self._size] = student_id
+            if self._ann is not None:
+                self._lists[self._size] = self._ann.assign(vector)[0]
+            self._size += 1
+            self.version += 1
+
+    def remove(self, student_id):
+        """Drop a student from the index"""
+        with self._lock:
+            self._hide(student_id)
+            self.version += 1
+
+    def _hide(self, student_id):
+        pos = self._store.position(student_id) if self._store is not None else None
+        if pos is not None and self._store_alive[pos]:
+            # Copy so searches holding the old mask stay consistent
+            alive = self._store_alive.copy()
+            alive[pos] = False
+            self._store_alive = alive
+            self._store_live -= 1
+        if np.any(self._ids[:self._size] == student_id):
+            self._delete(student_id)
+
+    def _grow(self, dim):
+        capacity = max(16, 2 * len(self._ids))
+        matrix = np.zeros((capacity, dim), dtype=np.float32)
+        ids = np.zeros(capacity, dtype=np.int64)
+        lists = np.zeros(capacity, dtype=np.int32)
+        if self._size and self._matrix.shape[1] == dim:
+            matrix[:self._size] = self._matrix[:self._size]
+            ids[:self._size] = self._ids[:self._size]
+            lists[:self._size] = self._lists[:self._size]
+        else:
+            self._size = 0
+            self._ann = None
+        self._matrix, self._ids, self._lists = matrix, ids, lists
+
+    def _delete(self, student_id):
+        # Copy instead of compacting in place so searches holding the old arrays stay valid
+        keep = self._ids[:self._size] != student_id
+        self._matrix = self._matrix[:self._size][keep]
+        self._ids = self._ids[:self._size][keep]
+        self._lists = self._lists[:self._size][keep]
+        self._size = len(self._ids)
+
+    def _score_store(self, store, alive, lists, queries, probed):
+        if probed is None:
+            # Full scan straight over the quantized rows, one bounded block at a time
+            scores = np.empty((len(queries), len(store)), dtype=np.float32)
+            for start in range(0, len(store), store.block_rows):
+                end = min(start + store.block_rows, len(store))
+                scores[:, start:end] = store.dot(queries, start, end)
+            scores[:, ~alive] = -np.inf
+            return scores, store.ids
+
+        rows = np.flatnonzero(alive & probed.any(axis=0)[lists])
+        scores = np.empty((len(queries), len(rows)), dtype=np.float32)
+        for start in range(0, len(rows), store.block_rows):
+            block = rows[start:start + store.block_rows]
+            scores[:, start:start + len(block)] = store.dot_rows(queries, block)
+        scores[~probed[:, lists[rows]]] = -np.inf
+        return scores, store.ids[rows]
+
+    def _score_resident(self, embeddings, student_ids, lists, queries, probed):
+        if probed is None:
+            return queries @ embeddings.T, student_ids
+        # Score only rows in cells probed by at least one query, then mask the rest per query
+        candidates = np.flatnonzero(probed.any(axis=0)[lists])
+        scores = queries @ embeddings[candidates].T
+        scores[~probed[:, lists[candidates]]] = -np.inf
+        return scores, student_ids[candidates]
+
+    def search(self, queries, k=1):
+        """Return the top-k (student_id, similarity) pairs for every query embedding"""
+        # Snapshot so concurrent add/remove never changes the arrays mid-search
+        with self._lock:
+            store, alive, store_lists, store_live = self._store, self._store_alive, self._store_lists, self._store_live
+            embeddings, student_ids = self.embeddings, self.student_ids
+            ann, lists = self._ann, self._lists[:self._size]
+        queries = l2_normalize(queries)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+
+        probed = ann.probe(queries) if ann is not None else None
+        parts = []
+        if store is not None and store_live:
+            parts.append(self._score_store(store, alive, store_lists, queries, probed))
+        if len(student_ids):
+            parts.append(self._score_resident(embeddings, student_ids, lists, queries, probed))
+        if not parts:
+            return [[] for _ in range(len(queries))]
+        scores = np.concatenate([p[0] for p in parts], axis=1)
+        student_ids = np.concatenate([p[1] for p in parts])
+        if len(student_ids) == 0:
+            return [[] for _ in range(len(queries))]
+
+        k = min(k, len(student_ids))
+        if k < len(student_ids):
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(len(student_ids)), (len(queries), 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        return [
+            [(int(student_ids[i]), float(s)) for i, s in zip(row_ids, row_scores) if s > -np.inf]
+            for row_ids, row_scores in zip(top, top_scores)
+        ]
+
+    def status(self):
+        return {
+            "mode": self.mode,
+            "students": len(self),
+            "version": self.version,
+            "store": {
+                "path": self._store.path,
+                "dtype": self._store.dtype,
+                "rows": len(self._store),
+                "live": self._store_live,
+            } if self._store is not None else None,
+            "resident": self._size,
+            "ann_active": self._ann is not None,
+            "nlist": self._ann.nlist if self._ann is not None else None,
+            "nprobe": self._ann.nprobe if self._ann is not None else None,
+        }
+
+    def match(self, queries, threshold=MATCH_THRESHOLD):
+        """Return the best matching student id (or None) for every query embedding"""
+        with metrics.timer("search"):
+            return [
+                hits[0][0] if hits and hits[0][1] >= threshold else None
+                for hits in self.search(queries, k=1)
+            ]
+
+
+class EmbeddingLog:
+    """Append-only file of enrollment embeddings with add/delete records
+
+    Layout: magic, model name, then records of (op, student_id, dim, float32[dim]).
+    A later "A" record for the same student replaces the earlier one and a "D"
+    record deletes it, so enrolling a student never rewrites existing data.
+    """
+
+    MAGIC = b"FIDX1"
+    RECORD = struct.Struct("<cqI")
+    # Bytes checksummed to recognise a log position after restarts
+    FINGERPRINT_BYTES = 4096
+
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        # End of the records this process has applied, and the fingerprint there;
+        # anything past it was appended by another process
+        self.position = 0
+        self.position_fingerprint = 0
+        self._lock = threading.Lock()
+
+    def _mark(self, position):
+        self.position = position
+        self.position_fingerprint = self.fingerprint(position)
+
+    def moved(self):
+        """Whether another process appended to (or compacted) the log since this one last read or wrote it"""
+        return self.size() != self.position or self.fingerprint(self.position) != self.position_fingerprint
+
+    def _write_header(self, f, model_name):
+        name = model_name.encode()
+        f.write(self.MAGIC + struct.pack("<H", len(name)) + name)
+
+    def size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def fingerprint(self, size=None):
+        """CRC of the bytes just before a log position, to check that a snapshot's position still holds"""
+        size = self.size() if size is None else size
+        if size == 0 or size > self.size():
+            return 0
+        with open(self.path, "rb") as f:
+            f.seek(max(0, size - self.FINGERPRINT_BYTES))
+            return zlib.crc32(f.read(min(size, self.FINGERPRINT_BYTES)))
+
+    def replay(self, model_name, start=None, repair=True):
+        """Read the log and return ({student_id: embedding} for live entries, records read)
+
+        With start (a byte position from an earlier snapshot) only the records
+        after it are read, and deletions come back as None to apply on top.
+        Entries are None when the log cannot be used. Without repair a torn tail
+        is left alone, since another process may still be writing it.
+        """
+        entries = {}
+        records = 0
+        if not os.path.exists(self.path):
+            if start is None:
+                self.records = 0
+            self._mark(0)
+            return entries, records
+
+        with open(self.path, "rb") as f:
+            header = f.read(len(self.MAGIC) + 2)
+            if not header.startswith(self.MAGIC) or len(header) < len(self.MAGIC) + 2:
+                print(f"⚠ Ignoring unreadable face index file: {self.path}")
+                return None, 0
+            (name_len,) = struct.unpack_from("<H", header, len(self.MAGIC))
+            if f.read(name_len).decode() != model_name:
+                print("⚠ Face index was built with another model, re-embedding")
+                return None, 0
+            # A snapshot taken before the log existed sits at 0, inside the header
+            base = f.tell() if start is None else max(start, f.tell())
+            f.seek(base)
+            data = f.read()
+
+        offset = 0
+        while offset + self.RECORD.size <= len(data):
+            op, student_id, dim = self.RECORD.unpack_from(data, offset)
+            end = offset + self.RECORD.size + 4 * dim
+            if end > len(data):
+                break
+            if op == b"A":
+                entries[student_id] = np.frombuffer(data, dtype=np.float32, count=dim, offset=offset + self.RECORD.size)
+            elif start is None:
+                entries.pop(student_id, None)
+            else:
+                entries[student_id] = None
+            records += 1
+            offset = end
+
+        if offset < len(data) and repair:
+            # Torn write at the tail, cut it off so new records stay aligned
+            with open(self.path, "r+b") as f:
+                f.truncate(base + offset)
+
+        self._mark(base + offset)
+        if start is None:
+            self.records = records
+        return entries, records
+
+    def append(self, student_id, embedding, model_name):
+        """Record a new or replacement embedding for a student"""
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        self._append(b"A", student_id, vector, model_name)
+
+    def delete(self, student_id, model_name):
+        """Record that a student is no longer enrolled"""
+        self._append(b"D", student_id, np.zeros(0, dtype=np.float32), model_name)
+
+    def _append(self, op, student_id, vector, model_name):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "ab") as f:
+                # Only move past records this process has already applied
+                caught_up = f.tell() == self.position
+                if f.tell() == 0:
+                    self._write_header(f, model_name)
+                f.write(self.RECORD.pack(op, student_id, len(vector)) + vector.tobytes())
+                end = f.tell()
+            self.records += 1
+            if caught_up:
+                self._mark(end)
+
+    def rewrite(self, entries, model_name):
+        """Compact the log down to one record per live student"""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                self._write_header(f, model_name)
+                for student_id, vector in entries.items():
+                    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+                    f.write(self.RECORD.pack(b"A", student_id, len(vector)) + vector.tobytes())
+            os.replace(tmp_path, self.path)
+            self.records = len(entries)
+            self._mark(self.size())
+
+
+# Shared index used by the API and the recognition helpers
+face_index = FaceIndex()
+embedding_log = EmbeddingLog(INDEX_PATH)
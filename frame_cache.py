@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+from config import RESULT_CACHE_SIZE, RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_HASH_SIZE, RESULT_CACHE_MAX_DISTANCE
+
+
+def frame_hash(img, size=RESULT_CACHE_HASH_SIZE):
+    """Difference hash of a BGR frame as a size²-bit integer
+
+    Each bit says whether a cell of the downscaled grayscale frame is brighter than
+    its right neighbour, so JPEG noise and small exposure drift keep the hash while
+    anything that moves across a cell flips its bits.
+    """
+    # OpenCV loads with the first frame, so the CRUD routes can report cache stats without it
+    import cv2
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class FrameResultCache:
+    """LRU/TTL cache of recognition results for near-identical frames
+
+    Frames whose hashes differ in at most max_distance bits share an entry, so a
+    static camera polled every few hundred milliseconds skips detection, embedding
+    and search. The cache remembers the face index version its entries were matched
+    against and is dropped as a whole once the index changes (enrollments, removals).
+    """
+
+    def __init__(self, size=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL_SECONDS, max_distance=RESULT_CACHE_MAX_DISTANCE):
+        self.size = size
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        # hash -> (student ids, stored at), all matched against index version _version
+        self._entries = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key, version):
+        """Cached student ids for a frame hash, or None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            found = key if key in self._entries else None
+            if found is None and self.max_distance:
+                # Nearest stored hash; the cache is small enough to scan
+                best = self.max_distance + 1
+                for stored in self._entries:
+                    distance = bin(stored ^ key).count("1")
+                    if distance < best:
+                        found, best = stored, distance
+            if found is not None and now - self._entries[found][1] > self.ttl:
+                del self._entries[found]
+                self.expired += 1
+                found = None
+            if found is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(found)
+            self.hits += 1
+            return list(self._entries[found][0])
+
+    def put(self, key, student_ids, version):
+        """Store a result matched against the given index version (dropped if the index moved on since)"""
+        with self._lock:
+            # Versions only grow, so an older one means the index changed during recognition
+            if self._version is not None and version < self._version:
+                return
+            self._check_version(version)
+            self._entries[key] = (tuple(student_ids), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def status(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "size": self.size,
+            "ttl_seconds": self.ttl,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+# Shared cache for /mark_attendance/ in the API process
+frame_cache = FrameResultCache()
@@ -0,0 +1,156 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Prometheus metric names are prefixed with this
+NAMESPACE = "attendance"
+
+# Counters exposed at /metrics, with their help text
+COUNTERS = {
+    "faces_total": "Recognized faces by result (recognized = newly marked, already_marked, unknown)",
+    "errors_total": "Errors by stage",
+    "result_cache_total": "/mark_attendance/ result cache lookups by result (hit, miss)",
+}
+
+
+class Histogram:
+    """Latency histogram over fixed, log-spaced buckets
+
+    Observing is a bisect and two increments, so it can sit on every hot path.
+    Percentiles are interpolated inside the bucket they fall in (within ~20%).
+    """
+
+    # Upper bounds in seconds: 0.5 ms doubling every two buckets up to about 46 s
+    BUCKETS = tuple(0.0005 * 2 ** (i / 2) for i in range(34))
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.BUCKETS[i - 1] if i else 0.0
+                upper = self.BUCKETS[i] if i < len(self.BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+
+class Metrics:
+    """Per-stage latency histograms and labelled counters for the hot path"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage, timings=None):
+        """Time a block into the stage's histogram (and into timings[stage] if given)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self.observe(stage, seconds)
+            if timings is not None:
+                timings[stage] = timings.get(stage, 0.0) + seconds
+
+    def count(self, name, n=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def reset(self):
+        """Drop every histogram and counter (between benchmark runs)"""
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+
+    def snapshot(self):
+        """Percentiles in milliseconds per stage, plus counter values"""
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": h.count,
+                    "p50_ms": round(h.percentile(0.50) * 1000, 2),
+                    "p95_ms": round(h.percentile(0.95) * 1000, 2),
+                    "p99_ms": round(h.percentile(0.99) * 1000, 2),
+                    "mean_ms": round(h.sum * 1000 / h.count, 2) if h.count else 0.0,
+                    "max_ms": round(h.max * 1000, 2),
+                }
+                for stage, h in sorted(self.histograms.items())
+            }
+            counters = {
+                name + "".join(f"[{v}]" for _, v in labels): value
+                for (name, labels), value in sorted(self.counters.items())
+            }
+        return {"stages": stages, "counters": counters}
+
+    def render(self):
+        """Prometheus text exposition of the histograms and counters"""
+        name = f"{NAMESPACE}_stage_seconds"
+        lines = [f"# HELP {name} Hot-path latency by stage", f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, n in zip(Histogram.BUCKETS, h.counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+
+            for counter, help_text in COUNTERS.items():
+                name = f"{NAMESPACE}_{counter}"
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for (key, labels), value in sorted(self.counters.items()):
+                    if key == counter:
+                        lines.append(f"{name}{format_labels(dict(labels))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = {k: str(v).replace("\\", "\\\\").replace('"', '\\"') for k, v in labels.items()}
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped.items()) + "}"
+
+def gauge_lines(name, help_text, values):
+    """Prometheus gauge lines for {labels tuple or None: value}"""
+    name = f"{NAMESPACE}_{name}"
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for labels, value in values.items():
+        if value is not None:
+            lines.append(f"{name}{format_labels(dict(labels or ()))} {value}")
+    return lines
+
+def server_timing(timings):
+    """Server-Timing header value from {stage: seconds}"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+
+# Shared registry for the process (recognition workers report their timings back to it)
+metrics = Metrics()
@@ -0,0 +1,72 @@
+import threading
+import time
+
+
+class ModelLifecycle:
+    """Loads the detector and recognizer once, warms them up and tracks readiness"""
+
+    def __init__(self):
+        self.state = "idle"
+        self.error = None
+        self.timings = {}
+        self.first_request_seconds = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def start(self, steps, process_started=None):
+        """Run (name, fn) startup steps in a background thread so the API can serve meanwhile"""
+        if self._thread is not None:
+            return
+        self.state = "loading"
+        self._thread = threading.Thread(
+            target=self._run, args=(steps, process_started), name="model-lifecycle", daemon=True
+        )
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def _run(self, steps, process_started):
+        started = time.perf_counter()
+        for name, fn in steps:
+            step_started = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                self.state = "error"
+                self.error = f"{name}: {str(e)}"
+                print(f"❌ Startup step '{name}' failed: {e}")
+                return
+            self.timings[name] = round(time.perf_counter() - step_started, 3)
+            print(f"⏱ {name}: {self.timings[name]:.2f}s")
+
+        self.timings["total"] = round(time.perf_counter() - started, 3)
+        if process_started is not None:
+            self.timings["cold_start"] = round(time.perf_counter() - process_started, 3)
+        self.state = "ready"
+        self._ready.set()
+        print(f"✅ Models ready in {self.timings['total']:.2f}s "
+              f"(cold start {self.timings.get('cold_start', self.timings['total']):.2f}s)")
+
+    def record_request(self, seconds):
+        """Log the latency of the first recognition request after startup"""
+        if self.first_request_seconds is None:
+            self.first_request_seconds = round(seconds, 3)
+            print(f"⏱ First recognition request: {self.first_request_seconds:.2f}s")
+
+    def health(self):
+        return {
+            "status": self.state,
+            "ready": self.ready,
+            "error": self.error,
+            "timings": self.timings,
+            "first_request_seconds": self.first_request_seconds,
+        }
+
+
+# Shared lifecycle for the API process
+model_lifecycle = ModelLifecycle()
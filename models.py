@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Time, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Time, Date, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -23,5 +23,51 @@ class Attendance(Base):
     student_id = Column(Integer, ForeignKey("students.id"))
     time = Column(Time)
     date = Column(Date)
+    # Camera whose pipeline recognized the student (NULL for uploads to /mark_attendance/)
+    camera_id = Column(Integer, ForeignKey("cameras.id"), nullable=True)
 
-    student = relationship("Student", back_populates="attendances")
\ No newline at end of file
+    student = relationship("Student", back_populates="attendances")
+
+    __table_args__ = (
+        # One row per student per day, enforced by the database across workers
+        Index("ux_attendance_student_date", "student_id", "date", unique=True),
+        # Date-range filters and keyset pagination in (date, time, id) order
+        Index("ix_attendance_date_time", "date", "time", "id"),
+        Index("ix_attendance_camera_date", "camera_id", "date"),
+    )
+
+
+class Camera(Base):
+    """A lecture-hall camera (registered from cameras.json, see cameras.py)"""
+    __tablename__ = "cameras"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    source = Column(String, nullable=False)
+    lecture = Column(String, nullable=True)
+    room = Column(String, nullable=True)
+    enabled = Column(Boolean, nullable=False, default=True)
+
+
+class DailyAttendanceSummary(Base):
+    """Students present per day, lecture and batch (kept current by triggers in reports.py)"""
+    __tablename__ = "daily_attendance_summary"
+
+    date = Column(Date, primary_key=True)
+    lecture = Column(String, primary_key=True)
+    batch = Column(String, primary_key=True)
+    present_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_daily_summary_batch_date", "batch", "date"),
+    )
+
+
+class StudentAttendanceSummary(Base):
+    """Days present per student (kept current by triggers in reports.py)"""
+    __tablename__ = "student_attendance_summary"
+
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    present_days = Column(Integer, nullable=False, default=0)
+    first_date = Column(Date)
+    last_date = Column(Date)
@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+
+from config import MOTION_PIXEL_THRESHOLD, MOTION_AREA_THRESHOLD, MOTION_DOWNSCALE_WIDTH
+
+
+class MotionGate:
+    """Cheap scene-change filter run before face detection
+
+    Frames are downscaled to grayscale, blurred and differenced against the last
+    frame that passed the gate. Frames with too few changed pixels are skipped.
+    """
+
+    def __init__(self, pixel_threshold=MOTION_PIXEL_THRESHOLD, area_threshold=MOTION_AREA_THRESHOLD,
+                 width=MOTION_DOWNSCALE_WIDTH):
+        self.pixel_threshold = pixel_threshold
+        self.area_threshold = area_threshold
+        self.width = width
+        self._reference = None
+        self.hits = 0
+        self.misses = 0
+        self.last_change = 0.0
+
+    def _prepare(self, frame):
+        height = max(1, int(frame.shape[0] * self.width / frame.shape[1]))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def check(self, frame):
+        """Return True if the frame changed enough since the last processed frame"""
+        current = self._prepare(frame)
+        if self._reference is None or self._reference.shape != current.shape:
+            changed = 1.0
+        else:
+            diff = cv2.absdiff(current, self._reference)
+            changed = float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+        self.last_change = round(changed, 4)
+
+        if changed < self.area_threshold:
+            self.misses += 1
+            return False
+
+        self._reference = current
+        self.hits += 1
+        return True
+
+    def status(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "last_change": self.last_change,
+            "pixel_threshold": self.pixel_threshold,
+            "area_threshold": self.area_threshold,
+        }
@@ -0,0 +1,338 @@
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from config import PIPELINE_FRAME_SKIP, PIPELINE_QUEUE_SIZE, PIPELINE_SLOTS, MOTION_GATE_ENABLED, EMBED_BATCH_SIZE
+from database import SessionLocal
+from attendance import record_attendance, attendance_message
+from detect import detect_faces, embed_faces
+from face_index import face_index
+from tracker import FaceTracker
+from motion import MotionGate
+from metrics import metrics
+
+
+class FairScheduler:
+    """Shares a fixed number of detect/embed slots between camera pipelines
+
+    A free slot goes to the waiting camera that has used the least processing
+    time, so one busy lecture hall cannot starve the others. A camera that waits
+    simply drops frames, because its capture stage only keeps the newest.
+    """
+
+    def __init__(self, slots=PIPELINE_SLOTS):
+        self.slots = max(1, slots)
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = {}
+        self._used = {}
+        self._wait_seconds = {}
+
+    def acquire(self, camera, stop):
+        """Block until the camera may run a job; False if stop was set first"""
+        started = time.perf_counter()
+        with self._cond:
+            if not self._waiting.get(camera):
+                # A camera that was idle rejoins level with the busy ones instead of
+                # having banked the time it spent without work
+                busy = [self._used[c] for c, n in self._waiting.items() if n]
+                self._used[camera] = max(self._used.get(camera, 0.0), min(busy, default=0.0))
+            self._waiting[camera] = self._waiting.get(camera, 0) + 1
+            try:
+                while not self._can_run(camera):
+                    if stop.is_set():
+                        return False
+                    self._cond.wait(0.5)
+                self._active += 1
+            finally:
+                self._waiting[camera] -= 1
+                self._wait_seconds[camera] = self._wait_seconds.get(camera, 0.0) + time.perf_counter() - started
+                # This camera no longer heads the queue, so the next one may take a still-free slot
+                self._cond.notify_all()
+        return True
+
+    def release(self, camera, seconds):
+        with self._cond:
+            self._active -= 1
+            self._used[camera] += seconds
+            self._cond.notify_all()
+
+    def _can_run(self, camera):
+        if self._active >= self.slots:
+            return False
+        return camera == min((c for c, n in self._waiting.items() if n), key=self._used.get)
+
+    def status(self):
+        with self._cond:
+            total = sum(self._used.values())
+            return {
+                "slots": self.slots,
+                "active": self._active,
+                "cameras": {
+                    camera: {
+                        "busy_seconds": round(used, 3),
+                        "share": round(used / total, 3) if total else 0.0,
+                        "wait_seconds": round(self._wait_seconds.get(camera, 0.0), 3),
+                    }
+                    for camera, used in self._used.items()
+                },
+            }
+
+
+# One scheduler for every pipeline in the process
+fair_scheduler = FairScheduler()
+
+
+class RecognitionPipeline:
+    """Continuous capture → detect → embed → match → record, one thread per stage
+
+    Stages are joined by bounded queues. A full queue blocks the stage before it,
+    and the capture stage drops its oldest pending frame instead of falling behind
+    the live stream. The detect and embed stages take turns with other cameras'
+    pipelines through the shared FairScheduler.
+    """
+
+    STAGES = ("detect", "embed", "match", "record")
+    # Stages that run the face models and so compete for CPU across cameras
+    SCHEDULED_STAGES = ("detect", "embed")
+
+    def __init__(self, stream, frame_skip=PIPELINE_FRAME_SKIP, queue_size=PIPELINE_QUEUE_SIZE,
+                 motion_gate=MOTION_GATE_ENABLED, camera="default", camera_id=None, scheduler=None):
+        self.stream = stream
+        # Name events are tagged with (the stream source may hold credentials) and the
+        # registry id stored on attendance rows
+        self.camera = camera
+        self.camera_id = camera_id
+        self.scheduler = scheduler or fair_scheduler
+        self.frame_skip = max(0, frame_skip)
+        self.queue_size = queue_size
+        self.results = deque(maxlen=50)
+        self.batch_sizes = deque(maxlen=100)
+        self.tracker = FaceTracker()
+        self.motion_gate = MotionGate() if motion_gate else None
+        self._stop = threading.Event()
+        self._threads = []
+        self._queues = {}
+        self._started_at = None
+        self.frames_seen = 0
+        self.frames_skipped = 0
+        self.frames_dropped = 0
+        self.stage_stats = {name: {"processed": 0, "errors": 0, "busy_seconds": 0.0} for name in self.STAGES}
+        self.last_error = None
+        self._result_seq = 0
+        # Seconds from frame capture until the pipeline was done with it (smoothed)
+        self.lag = 0.0
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        if self.running:
+            return self
+        self._stop.clear()
+        self._started_at = time.time()
+        self.tracker.reset()
+        self._queues = {name: queue.Queue(maxsize=self.queue_size) for name in self.STAGES}
+
+        handlers = {
+            "detect": self._detect,
+            "embed": self._embed,
+            "match": self._match,
+            "record": self._record,
+        }
+        self._threads = [threading.Thread(target=self._capture, name="pipeline:capture", daemon=True)]
+        for i, name in enumerate(self.STAGES):
+            outbox = self._queues[self.STAGES[i + 1]] if i + 1 < len(self.STAGES) else None
+            self._threads.append(threading.Thread(
+                target=self._run_stage,
+                args=(name, handlers[name], self._queues[name], outbox),
+                name=f"pipeline:{name}",
+                daemon=True
+            ))
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        # Jobs still queued will never finish; free their tracks
+        for q in self._queues.values():
+            while True:
+                try:
+                    self._release(q.get_nowait())
+                except queue.Empty:
+                    break
+
+    def _release(self, job):
+        """Let the faces of an abandoned or failed job be embedded again"""
+        for face in job.get("faces", ()) if job else ():
+            self.tracker.release(face["track_id"])
+
+    def status(self):
+        elapsed = time.time() - self._started_at if self._started_at else 0
+        evaluated = self.stage_stats["detect"]["processed"]
+        return {
+            "running": self.running,
+            "camera": self.camera,
+            "camera_id": self.camera_id,
+            "frame_skip": self.frame_skip,
+            "frames_seen": self.frames_seen,
+            "frames_skipped": self.frames_skipped,
+            "frames_dropped": self.frames_dropped,
+            "evaluated_fps": round(evaluated / elapsed, 2) if elapsed else 0.0,
+            "lag": round(self.lag, 3),
+            "queue_depths": {name: q.qsize() for name, q in self._queues.items()},
+            "stages": self.stage_stats,
+            "avg_embed_batch": round(sum(self.batch_sizes) / len(self.batch_sizes), 2) if self.batch_sizes else 0.0,
+            "tracker": self.tracker.status(),
+            "motion_gate": self.motion_gate.status() if self.motion_gate else None,
+            "last_error": self.last_error,
+            "results": list(self.results),
+        }
+
+    # Stages
+
+    def _capture(self):
+        inbox = self._queues["detect"]
+        seq = 0
+        while not self._stop.is_set():
+            item = self.stream.wait_for_frame(seq, timeout=1.0)
+            if item is None:
+                continue
+            seq, timestamp, frame = item
+
+            self.frames_seen += 1
+            if (self.frames_seen - 1) % (self.frame_skip + 1):
+                self.frames_skipped += 1
+                continue
+
+            # Static scene: nothing new to detect
+            if self.motion_gate is not None and not self.motion_gate.check(frame):
+                continue
+
+            job = {"timestamp": timestamp, "frame": frame}
+            try:
+                inbox.put_nowait(job)
+            except queue.Full:
+                # Detection is behind: replace the stalest frame rather than queueing more
+                try:
+                    inbox.get_nowait()
+                    self.frames_dropped += 1
+                except queue.Empty:
+                    pass
+                inbox.put_nowait(job)
+
+    def _run_stage(self, name, handler, inbox, outbox):
+        stats = self.stage_stats[name]
+        while not self._stop.is_set():
+            try:
+                job = inbox.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            scheduled = name in self.SCHEDULED_STAGES
+            if scheduled and not self.scheduler.acquire(self.camera, self._stop):
+                self._release(job)
+                break
+
+            timestamp = job["timestamp"]
+            start = time.perf_counter()
+            try:
+                job = handler(job)
+            except Exception as e:
+                stats["errors"] += 1
+                metrics.count("errors_total", stage=name)
+                self.last_error = f"{name}: {str(e)}"
+                print(f"Pipeline {name} error: {e}")
+                self._release(job)
+                continue
+            finally:
+                busy = time.perf_counter() - start
+                if scheduled:
+                    self.scheduler.release(self.camera, busy)
+                # Matching is timed as "search" inside the face index itself
+                if name != "match":
+                    metrics.observe(name, busy)
+                stats["busy_seconds"] = round(stats["busy_seconds"] + busy, 3)
+            stats["processed"] += 1
+
+            if job is None or outbox is None:
+                # This frame is finished
+                self.lag = 0.8 * self.lag + 0.2 * (time.time() - timestamp)
+                continue
+
+            # A stage may hand on several jobs at once (the embed stage batches frames)
+            for item in job if isinstance(job, list) else [job]:
+                # Blocking put pushes backpressure onto the previous stage
+                while not self._stop.is_set():
+                    try:
+                        outbox.put(item, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                else:
+                    self._release(item)
+
+    def _detect(self, job):
+        faces = self.tracker.update(detect_faces(job.pop("frame")), job["timestamp"])
+
+        # Faces on known tracks reuse their identity and skip embedding entirely
+        job["faces"] = [f for f in faces if f["needs_embedding"]]
+        return job if job["faces"] else None
+
+    def _embed(self, job):
+        # Pull any other frames already waiting so all their faces share one forward pass
+        jobs = [job]
+        faces = list(job["faces"])
+        inbox = self._queues["embed"]
+        while len(faces) < EMBED_BATCH_SIZE:
+            try:
+                extra = inbox.get_nowait()
+            except queue.Empty:
+                break
+            jobs.append(extra)
+            faces.extend(extra["faces"])
+
+        try:
+            embeddings = embed_faces(faces)
+        except Exception:
+            # The caller releases the first job
+            for extra in jobs[1:]:
+                self._release(extra)
+            raise
+
+        start = 0
+        for item in jobs:
+            item["embeddings"] = embeddings[start:start + len(item["faces"])]
+            start += len(item["faces"])
+        self.batch_sizes.append(len(faces))
+        return jobs
+
+    def _match(self, job):
+        job["student_ids"] = face_index.match(job["embeddings"])
+        for face, student_id in zip(job["faces"], job["student_ids"]):
+            self.tracker.set_identity(face["track_id"], student_id, job["timestamp"])
+        return job
+
+    def _record(self, job):
+        db = SessionLocal()
+        try:
+            marked_names = record_attendance(db, job["student_ids"], datetime.fromtimestamp(job["timestamp"]),
+                                             camera=self.camera, camera_id=self.camera_id)
+        finally:
+            db.close()
+
+        self._result_seq += 1
+        self.results.append({
+            "seq": self._result_seq,
+            "timestamp": job["timestamp"],
+            "faces": len(job["faces"]),
+            "marked": marked_names,
+            "message": attendance_message(True, marked_names),
+        })
@@ -0,0 +1,172 @@
+import base64
+import csv
+import io
+import json
+from datetime import date, time
+from sqlalchemy import and_, or_
+
+from database import SessionLocal
+from models import Student, Attendance
+from face_images import image_url, is_face_crop, thumbnail_path
+
+# Page size limits for the list endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Rows fetched per round trip when streaming an export
+EXPORT_CHUNK_SIZE = 1000
+
+ATTENDANCE_FIELDS = ["id", "name", "roll_no", "batch", "course", "lecture", "date", "time", "camera_id"]
+STUDENT_FIELDS = ["id", "name", "roll_no", "course", "batch", "lecture", "image_url", "thumbnail_url"]
+
+
+def encode_cursor(values):
+    """Opaque keyset cursor for the last row of a page"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor, size):
+    """Values of a cursor from encode_cursor; ValueError unless it holds size values"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+def page_size(limit):
+    return max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+
+
+def attendance_row(a, s):
+    return {
+        "id": a.id,
+        "name": s.name,
+        "roll_no": s.roll_no,
+        "batch": s.batch,
+        "course": s.course,
+        "lecture": s.lecture,
+        "date": str(a.date),
+        "time": str(a.time) if a.time else "N/A",
+        "camera_id": a.camera_id,
+    }
+
+def student_row(s):
+    return {
+        "id": s.id,
+        "name": s.name,
+        "roll_no": s.roll_no,
+        "course": s.course,
+        "batch": s.batch,
+        "lecture": s.lecture,
+        "image_url": image_url(s.image),
+        # Students enrolled before face crops existed have no thumbnail
+        "thumbnail_url": image_url(thumbnail_path(s.image)) if is_face_crop(s.image) else image_url(s.image),
+    }
+
+
+def filter_students(query, batch=None, course=None, lecture=None):
+    if batch:
+        query = query.filter(Student.batch == batch)
+    if course:
+        query = query.filter(Student.course == course)
+    if lecture:
+        query = query.filter(Student.lecture == lecture)
+    return query
+
+def attendance_query(db, date_from=None, date_to=None, batch=None, course=None, lecture=None, student_id=None,
+                     camera_id=None):
+    """Attendance ⋈ Student, filtered, newest first (rows without a time last within their day)"""
+    query = db.query(Attendance, Student).join(Student, Attendance.student_id == Student.id)
+    if date_from:
+        query = query.filter(Attendance.date >= date_from)
+    if date_to:
+        query = query.filter(Attendance.date <= date_to)
+    if student_id is not None:
+        query = query.filter(Attendance.student_id == student_id)
+    if camera_id is not None:
+        query = query.filter(Attendance.camera_id == camera_id)
+    query = filter_students(query, batch, course, lecture)
+    return query.order_by(Attendance.date.desc(), Attendance.time.is_(None), Attendance.time.desc(), Attendance.id.desc())
+
+def attendance_page(db, cursor=None, limit=None, **filters):
+    """One keyset page of attendance rows plus the cursor for the next page (or None)"""
+    query = attendance_query(db, **filters)
+    if cursor:
+        last_date, last_time, last_id = decode_cursor(cursor, 3)
+        try:
+            last_date = date.fromisoformat(last_date)
+            last_time = time.fromisoformat(last_time) if last_time is not None else None
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+        if not isinstance(last_id, int):
+            raise ValueError("Invalid cursor")
+        # Rows strictly after the cursor in (date, time, id) descending order, NULL times last
+        if last_time is None:
+            same_day = and_(Attendance.time.is_(None), Attendance.id < last_id)
+        else:
+            same_day = or_(
+                Attendance.time.is_(None),
+                Attendance.time < last_time,
+                and_(Attendance.time == last_time, Attendance.id < last_id)
+            )
+        query = query.filter(or_(Attendance.date < last_date, and_(Attendance.date == last_date, same_day)))
+
+    limit = page_size(limit)
+    records = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        a = records[-1][0]
+        next_cursor = encode_cursor([a.date.isoformat(), a.time.isoformat() if a.time else None, a.id])
+    return [attendance_row(a, s) for a, s in records], next_cursor
+
+def student_page(db, cursor=None, limit=None, **filters):
+    """One keyset page of students ordered by id plus the next cursor (or None)"""
+    query = filter_students(db.query(Student), **filters).order_by(Student.id)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        if not isinstance(last_id, int):
+            raise ValueError("Invalid cursor")
+        query = query.filter(Student.id > last_id)
+
+    limit = page_size(limit)
+    students = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(students) > limit:
+        students = students[:limit]
+        next_cursor = encode_cursor([students[-1].id])
+    return [student_row(s) for s in students], next_cursor
+
+
+def stream_rows(make_query, to_row, fields, fmt):
+    """Yield an NDJSON or CSV export chunk by chunk from a server-side cursor
+
+    The generator owns its session because FastAPI closes request-scoped
+    dependencies before a streaming body is sent.
+    """
+    db = SessionLocal()
+    try:
+        query = make_query(db).yield_per(EXPORT_CHUNK_SIZE)
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=fields)
+            writer.writeheader()
+            for i, record in enumerate(query, 1):
+                writer.writerow(to_row(record))
+                if i % EXPORT_CHUNK_SIZE == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            chunk = []
+            for record in query:
+                chunk.append(json.dumps(to_row(record)))
+                if len(chunk) == EXPORT_CHUNK_SIZE:
+                    yield "\n".join(chunk) + "\n"
+                    chunk = []
+            if chunk:
+                yield "\n".join(chunk) + "\n"
+    finally:
+        db.close()
@@ -0,0 +1,332 @@
+import argparse
+import itertools
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+import numpy as np
+
+from config import REPLAY_STRIDE, REPLAY_CHUNK_FRAMES, RECORDINGS_DIR, TRACKER_REVERIFY_SECONDS, MOTION_GATE_ENABLED
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+_job_ids = itertools.count(1)
+
+
+def recognize_chunk(frames, reverify_seconds=TRACKER_REVERIFY_SECONDS):
+    """Detect and embed a run of consecutive sampled frames on a worker
+
+    Faces are tracked across the run, so each track is embedded once (again
+    after reverify_seconds of video time). Returns [(video_seconds, embeddings)]
+    for the frames that had faces to embed.
+    """
+    from detect import detect_faces, embed_faces
+    from tracker import FaceTracker
+
+    tracker = FaceTracker(reverify_seconds=reverify_seconds)
+    results = []
+    for seconds, frame in frames:
+        faces = [f for f in tracker.update(detect_faces(frame), seconds) if f["needs_embedding"]]
+        if not faces:
+            continue
+        results.append((seconds, embed_faces(faces)))
+        # The identity is settled in the API process; here it only marks the track as embedded
+        for face in faces:
+            tracker.set_identity(face["track_id"], None, seconds)
+    return results
+
+def recording_path(path, root=RECORDINGS_DIR):
+    """Absolute path of a recording named relative to root; ValueError if it points outside root"""
+    root = os.path.realpath(root)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root:
+        raise ValueError(f"Recordings must be inside {RECORDINGS_DIR}")
+    return full
+
+def default_start(source, duration):
+    """Wall-clock time of the recording's first frame when none is given
+
+    Recorders write until the end, so a video's modification time minus its
+    duration is its start; a folder of frames starts at its first frame's time.
+    """
+    if os.path.isdir(source):
+        names = sorted(n for n in os.listdir(source) if n.lower().endswith(IMAGE_EXTENSIONS))
+        return datetime.fromtimestamp(os.path.getmtime(os.path.join(source, names[0]) if names else source))
+    return datetime.fromtimestamp(os.path.getmtime(source)) - timedelta(seconds=duration or 0)
+
+
+class ReplayJob:
+    """Runs a recording (video file or folder of frames) through recognition at full speed
+
+    A decode thread samples every stride-th frame and drops static ones with the
+    motion gate; runs of sampled frames are embedded in parallel on the worker
+    pool and matched here in recording order, so attendance is marked at the
+    video time a student first appears rather than at wall-clock time.
+    """
+
+    def __init__(self, source, start=None, stride=REPLAY_STRIDE, fps=None, camera=None, camera_id=None,
+                 chunk_frames=REPLAY_CHUNK_FRAMES, motion_gate=MOTION_GATE_ENABLED):
+        if not os.path.exists(source):
+            raise ValueError(f"Recording not found: {source}")
+        self.id = next(_job_ids)
+        self.source = source
+        self.start_time = start
+        self.stride = max(1, stride)
+        # Frame rate of the recording; read from the video, required for a folder (default 1/s)
+        self.fps = fps
+        self.camera = camera or "replay"
+        self.camera_id = camera_id
+        self.chunk_frames = max(1, chunk_frames)
+        self.motion_gate = None
+        if motion_gate:
+            from motion import MotionGate
+            self.motion_gate = MotionGate()
+        self.state = "pending"
+        self.error = None
+        self.duration = None
+        self.position = 0.0
+        self.frames_read = 0
+        self.frames_sampled = 0
+        self.frames_static = 0
+        self.frames_processed = 0
+        self.faces_embedded = 0
+        self.marked = 0
+        self.students = set()
+        self._frames = queue.Queue(maxsize=2 * self.chunk_frames)
+        self._stop = threading.Event()
+        self._started = None
+        self._finished = None
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, submit, max_in_flight):
+        """Process in a background thread, submitting chunks with submit(fn, *args) → Future"""
+        self._thread = threading.Thread(target=self.run, args=(submit, max_in_flight),
+                                        name=f"replay:{self.id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run(self, submit, max_in_flight):
+        from database import SessionLocal
+
+        self.state = "running"
+        self._started = time.perf_counter()
+        decoder = threading.Thread(target=self._decode, name=f"replay-decode:{self.id}", daemon=True)
+        decoder.start()
+
+        pending = deque()
+        chunk = []
+        db = SessionLocal()
+        try:
+            while True:
+                item = self._frames.get()
+                if item is not None:
+                    chunk.append(item)
+                if chunk and (item is None or len(chunk) >= self.chunk_frames):
+                    pending.append((chunk[-1][0], len(chunk), submit(recognize_chunk, chunk, TRACKER_REVERIFY_SECONDS)))
+                    chunk = []
+                # Results are consumed in recording order so first sightings win
+                while pending and (len(pending) >= max_in_flight or item is None):
+                    self._record(db, *pending.popleft())
+                if item is None:
+                    break
+            if self.error is None:
+                self.state = "stopped" if self._stop.is_set() else "done"
+        except Exception as e:
+            self.error = str(e)
+            print(f"❌ Replay {self.id} failed: {e}")
+        finally:
+            self._stop.set()
+            for _, _, future in pending:
+                future.cancel()
+            # Unblock the decoder if it is waiting on a full queue
+            while decoder.is_alive():
+                try:
+                    self._frames.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            db.close()
+            self._finished = time.perf_counter()
+            if self.error is not None:
+                self.state = "error"
+
+    def _decode(self):
+        import cv2
+        try:
+            if os.path.isdir(self.source):
+                names = sorted(n for n in os.listdir(self.source) if n.lower().endswith(IMAGE_EXTENSIONS))
+                fps = self.fps or 1.0
+                self.duration = len(names) / fps
+                self._ensure_start()
+                for index in range(0, len(names), self.stride):
+                    if self._stop.is_set():
+                        break
+                    frame = cv2.imread(os.path.join(self.source, names[index]))
+                    self.frames_read = index + 1
+                    if frame is not None:
+                        self._offer(index / fps, frame)
+            else:
+                cap = cv2.VideoCapture(self.source)
+                if not cap.isOpened():
+                    raise ValueError(f"Cannot open video {self.source}")
+                fps = self.fps or cap.get(cv2.CAP_PROP_FPS) or 25.0
+                total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+                self.duration = total / fps if total > 0 else None
+                self._ensure_start()
+                index = 0
+                while not self._stop.is_set():
+                    # grab() skips the colour conversion and copy for frames that are not sampled
+                    if index % self.stride:
+                        ok, frame = cap.grab(), None
+                    else:
+                        ok, frame = cap.read()
+                    if not ok:
+                        break
+                    self.frames_read += 1
+                    if frame is not None:
+                        self._offer(index / fps, frame)
+                    index += 1
+                cap.release()
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self._put(None)
+
+    def _ensure_start(self):
+        if self.start_time is None:
+            self.start_time = default_start(self.source, self.duration)
+
+    def _offer(self, seconds, frame):
+        self.frames_sampled += 1
+        if self.motion_gate is not None and not self.motion_gate.check(frame):
+            self.frames_static += 1
+            return
+        self._put((seconds, frame))
+
+    def _put(self, item):
+        while True:
+            try:
+                self._frames.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if self._stop.is_set() and item is not None:
+                    return
+
+    def _record(self, db, position, frames, future):
+        from attendance import record_attendance
+        from face_index import face_index
+
+        results = future.result()
+        self.frames_processed += frames
+        self.position = position
+        if not results:
+            return
+
+        embeddings = np.concatenate([e for _, e in results])
+        student_ids = face_index.match(embeddings)
+        self.faces_embedded += len(embeddings)
+        offset = 0
+        for seconds, frame_embeddings in results:
+            ids = student_ids[offset:offset + len(frame_embeddings)]
+            offset += len(frame_embeddings)
+            when = self.start_time + timedelta(seconds=seconds)
+            self.students.update(sid for sid in ids if sid is not None)
+            labels = record_attendance(db, ids, when, camera=self.camera, camera_id=self.camera_id)
+            self.marked += sum(1 for label in labels if not label.endswith(("(Already Marked)", "(not registered)")))
+
+    def status(self):
+        end = self._finished or time.perf_counter()
+        elapsed = end - self._started if self._started else 0.0
+        return {
+            "id": self.id,
+            "state": self.state,
+            "source": self.source,
+            "camera": self.camera,
+            "start": self.start_time.isoformat(timespec="seconds") if self.start_time else None,
+            "stride": self.stride,
+            "duration_seconds": round(self.duration, 1) if self.duration else None,
+            "position_seconds": round(self.position, 1),
+            "frames_read": self.frames_read,
+            "frames_sampled": self.frames_sampled,
+            "frames_static": self.frames_static,
+            "frames_processed": self.frames_processed,
+            "faces_embedded": self.faces_embedded,
+            "students_seen": len(self.students),
+            "marked": self.marked,
+            "elapsed_seconds": round(elapsed, 2),
+            # Seconds of recording processed per second of wall-clock time
+            "speed": round(self.position / elapsed, 1) if elapsed else 0.0,
+            "error": self.error,
+        }
+
+
+if __name__ == "__main__":
+    # python replay.py lecture.mp4|frames_folder [--start 2026-10-18T09:00] [--stride 25] [--workers N]
+    from config import RECOGNITION_WORKERS
+    from executor import RecognitionExecutor
+    from database import create_tables, SessionLocal
+
+    parser = argparse.ArgumentParser(description="Mark attendance from a recorded lecture (video file or folder of frames)")
+    parser.add_argument("source")
+    parser.add_argument("--start", type=datetime.fromisoformat,
+                        help="wall-clock time of the first frame (default: file time minus duration)")
+    parser.add_argument("--stride", type=int, default=REPLAY_STRIDE, help="process every Nth frame")
+    parser.add_argument("--fps", type=float, help="frame rate (required for a folder of frames, default 1)")
+    parser.add_argument("--camera", help="registered camera name the recording came from")
+    parser.add_argument("--workers", type=int, default=RECOGNITION_WORKERS)
+    parser.add_argument("--no-motion-gate", action="store_true", help="process static frames too")
+    args = parser.parse_args()
+
+    create_tables()
+    from models import Student, Camera
+    from detect import build_face_index, init_worker
+    from attendance import attendance_cache, attendance_writer
+
+    db = SessionLocal()
+    try:
+        build_face_index(db.query(Student).all())
+        attendance_cache.load(db, datetime.now().date())
+        camera = db.query(Camera).filter(Camera.name == args.camera).first() if args.camera else None
+    finally:
+        db.close()
+    if args.camera and camera is None:
+        print(f"⚠ Camera {args.camera} is not registered, attendance rows will have no camera id")
+    attendance_writer.start()
+
+    try:
+        job = ReplayJob(args.source, start=args.start, stride=args.stride, fps=args.fps, camera=args.camera,
+                        camera_id=camera.id if camera else None, motion_gate=not args.no_motion_gate)
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        sys.exit(1)
+
+    executor = RecognitionExecutor("process", args.workers, initializer=init_worker).start()
+    try:
+        job.start(executor.submit, 2 * executor.workers)
+        while job.running:
+            job._thread.join(5)
+            status = job.status()
+            print(f"⏱ {status['position_seconds']:.0f}/{status['duration_seconds'] or '?'}s of video, "
+                  f"{status['speed']}x real time, {status['marked']} marked")
+    finally:
+        executor.shutdown()
+    attendance_writer.stop()
+
+    status = job.status()
+    if status["state"] == "error":
+        print(f"❌ Replay failed: {status['error']}")
+        sys.exit(1)
+    print(f"✅ Replayed {status['position_seconds']:.0f}s of video in {status['elapsed_seconds']}s "
+          f"({status['speed']}x): {status['frames_processed']} frames, {status['faces_embedded']} faces embedded, "
+          f"{status['students_seen']} students seen, {status['marked']} newly marked")
@@ -0,0 +1,185 @@
+import sys
+from sqlalchemy import func, text
+
+from database import engine, SessionLocal
+from models import Student, Attendance, DailyAttendanceSummary, StudentAttendanceSummary
+
+# Keep the summary tables in step with every attendance row actually inserted
+# (insert-or-ignore conflicts fire nothing, so duplicates are never counted)
+ROLLUP_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_attendance_rollup_insert
+    AFTER INSERT ON attendance
+    BEGIN
+        INSERT INTO daily_attendance_summary (date, lecture, batch, present_count)
+        SELECT NEW.date, lecture, batch, 1 FROM students WHERE id = NEW.student_id
+        ON CONFLICT (date, lecture, batch) DO UPDATE SET present_count = present_count + 1;
+
+        INSERT INTO student_attendance_summary (student_id, present_days, first_date, last_date)
+        VALUES (NEW.student_id, 1, NEW.date, NEW.date)
+        ON CONFLICT (student_id) DO UPDATE SET
+            present_days = present_days + 1,
+            first_date = MIN(first_date, excluded.first_date),
+            last_date = MAX(last_date, excluded.last_date);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_attendance_rollup_delete
+    AFTER DELETE ON attendance
+    BEGIN
+        UPDATE daily_attendance_summary SET present_count = present_count - 1
+        WHERE date = OLD.date
+          AND (lecture, batch) = (SELECT lecture, batch FROM students WHERE id = OLD.student_id);
+        DELETE FROM daily_attendance_summary WHERE present_count <= 0;
+
+        UPDATE student_attendance_summary SET
+            present_days = present_days - 1,
+            first_date = (SELECT MIN(date) FROM attendance WHERE student_id = OLD.student_id),
+            last_date = (SELECT MAX(date) FROM attendance WHERE student_id = OLD.student_id)
+        WHERE student_id = OLD.student_id;
+        DELETE FROM student_attendance_summary WHERE present_days <= 0;
+    END
+    """,
+]
+
+
+def install_rollups():
+    """Create the rollup triggers and backfill summaries for databases that predate them"""
+    with engine.begin() as conn:
+        for trigger in ROLLUP_TRIGGERS:
+            conn.execute(text(trigger))
+
+    db = SessionLocal()
+    try:
+        empty = db.query(DailyAttendanceSummary).first() is None and db.query(StudentAttendanceSummary).first() is None
+        if empty and db.query(Attendance).first() is not None:
+            rebuild_rollups(db)
+    finally:
+        db.close()
+
+def rebuild_rollups(db):
+    """Recompute both summary tables from the raw attendance table in one transaction"""
+    db.query(DailyAttendanceSummary).delete()
+    db.query(StudentAttendanceSummary).delete()
+    db.execute(text(
+        "INSERT INTO daily_attendance_summary (date, lecture, batch, present_count) "
+        "SELECT a.date, s.lecture, s.batch, COUNT(*) FROM attendance a "
+        "JOIN students s ON s.id = a.student_id GROUP BY a.date, s.lecture, s.batch"
+    ))
+    db.execute(text(
+        "INSERT INTO student_attendance_summary (student_id, present_days, first_date, last_date) "
+        "SELECT student_id, COUNT(*), MIN(date), MAX(date) FROM attendance "
+        "WHERE student_id IS NOT NULL GROUP BY student_id"
+    ))
+    db.commit()
+    days = db.query(DailyAttendanceSummary).count()
+    students = db.query(StudentAttendanceSummary).count()
+    print(f"📊 Rebuilt attendance rollups: {days} daily rows, {students} students")
+    return {"daily_rows": days, "students": students}
+
+
+def filter_summary(query, date_from=None, date_to=None, batch=None, lecture=None):
+    if date_from:
+        query = query.filter(DailyAttendanceSummary.date >= date_from)
+    if date_to:
+        query = query.filter(DailyAttendanceSummary.date <= date_to)
+    if batch:
+        query = query.filter(DailyAttendanceSummary.batch == batch)
+    if lecture:
+        query = query.filter(DailyAttendanceSummary.lecture == lecture)
+    return query
+
+def attendance_rates(db, group_by="batch", date_from=None, date_to=None, batch=None, lecture=None):
+    """Attendance rate per batch or lecture: present / (enrolled students × class days)
+
+    A class day is any day on which at least one student of the group was marked.
+    """
+    if group_by not in ("batch", "lecture"):
+        raise ValueError("group_by must be 'batch' or 'lecture'")
+    summary_key = getattr(DailyAttendanceSummary, group_by)
+    student_key = getattr(Student, group_by)
+
+    totals = filter_summary(
+        db.query(summary_key, func.sum(DailyAttendanceSummary.present_count), func.count(func.distinct(DailyAttendanceSummary.date))),
+        date_from, date_to, batch, lecture
+    ).group_by(summary_key).all()
+
+    enrolled_query = db.query(student_key, func.count(Student.id))
+    if batch:
+        enrolled_query = enrolled_query.filter(Student.batch == batch)
+    if lecture:
+        enrolled_query = enrolled_query.filter(Student.lecture == lecture)
+    enrolled = dict(enrolled_query.group_by(student_key).all())
+
+    rates = []
+    for key, present, class_days in totals:
+        possible = enrolled.get(key, 0) * class_days
+        rates.append({
+            group_by: key,
+            "present": present,
+            "enrolled": enrolled.get(key, 0),
+            "class_days": class_days,
+            "rate": round(present / possible, 4) if possible else None,
+        })
+    return rates
+
+def daily_summary(db, date_from=None, date_to=None, batch=None, lecture=None):
+    """Students present per day, lecture and batch, newest day first"""
+    rows = filter_summary(db.query(DailyAttendanceSummary), date_from, date_to, batch, lecture).order_by(
+        DailyAttendanceSummary.date.desc(), DailyAttendanceSummary.batch, DailyAttendanceSummary.lecture
+    ).all()
+    return [
+        {"date": str(r.date), "lecture": r.lecture, "batch": r.batch, "present": r.present_count}
+        for r in rows
+    ]
+
+def student_summary(db, batch=None, course=None, lecture=None, student_id=None):
+    """Present days per student, with the rate against their batch's class days"""
+    query = db.query(Student, StudentAttendanceSummary).outerjoin(
+        StudentAttendanceSummary, StudentAttendanceSummary.student_id == Student.id
+    )
+    if batch:
+        query = query.filter(Student.batch == batch)
+    if course:
+        query = query.filter(Student.course == course)
+    if lecture:
+        query = query.filter(Student.lecture == lecture)
+    if student_id is not None:
+        query = query.filter(Student.id == student_id)
+
+    class_days = dict(
+        db.query(DailyAttendanceSummary.batch, func.count(func.distinct(DailyAttendanceSummary.date)))
+        .group_by(DailyAttendanceSummary.batch).all()
+    )
+
+    rows = []
+    for s, summary in query.order_by(Student.id).all():
+        present = summary.present_days if summary else 0
+        days = class_days.get(s.batch, 0)
+        rows.append({
+            "student_id": s.id,
+            "name": s.name,
+            "roll_no": s.roll_no,
+            "batch": s.batch,
+            "lecture": s.lecture,
+            "present_days": present,
+            "class_days": days,
+            "rate": round(present / days, 4) if days else None,
+            "first_date": str(summary.first_date) if summary and summary.first_date else None,
+            "last_date": str(summary.last_date) if summary and summary.last_date else None,
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    # python reports.py rebuild
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python reports.py rebuild")
+        sys.exit(1)
+    from database import create_tables
+    create_tables()
+    db = SessionLocal()
+    try:
+        rebuild_rollups(db)
+    finally:
+        db.close()
@@ -0,0 +1,35 @@
+import threading
+import time
+
+
+class Subscribers:
+    """Clients currently reading a streaming response, by token
+
+    Each client's generator touches its token on every poll and leaves when it is
+    closed; tokens of generators that are never closed age out after timeout.
+    """
+
+    def __init__(self, timeout=2.0):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._seen = {}
+
+    def join(self):
+        token = object()
+        self.touch(token)
+        return token
+
+    def touch(self, token):
+        with self._lock:
+            self._seen[token] = time.monotonic()
+
+    def leave(self, token):
+        with self._lock:
+            self._seen.pop(token, None)
+
+    def __len__(self):
+        now = time.monotonic()
+        with self._lock:
+            for token in [t for t, seen in self._seen.items() if now - seen > self.timeout]:
+                del self._seen[token]
+            return len(self._seen)
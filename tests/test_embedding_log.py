@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+
+from face_index import EmbeddingLog
+
+MODEL = "Facenet"
+
+
+def vector(seed, dim=8):
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+def test_replay_keeps_latest_record_per_student():
+    log = EmbeddingLog(os.path.join("index", "faces.idx"))
+    log.append(1, vector(1), MODEL)
+    log.append(2, vector(2), MODEL)
+    log.append(1, vector(3), MODEL)
+    log.delete(2, MODEL)
+
+    entries, records = EmbeddingLog(log.path).replay(MODEL)
+
+    assert list(entries) == [1]
+    np.testing.assert_array_equal(entries[1], vector(3))
+    assert records == 4
+
+
+def test_tail_replay_returns_deletions_as_none():
+    log = EmbeddingLog(os.path.join("index", "faces.idx"))
+    log.append(1, vector(1), MODEL)
+    log.append(2, vector(2), MODEL)
+    start = log.size()
+    log.append(1, vector(3), MODEL)
+    log.delete(2, MODEL)
+    log.delete(2, MODEL)
+
+    tail, records = EmbeddingLog(log.path).replay(MODEL, start=start)
+
+    assert tail.keys() == {1, 2}
+    np.testing.assert_array_equal(tail[1], vector(3))
+    assert tail[2] is None
+    assert records == 3
+
+
+def test_replay_cuts_off_a_torn_tail():
+    log = EmbeddingLog(os.path.join("index", "faces.idx"))
+    log.append(1, vector(1), MODEL)
+    intact = log.size()
+    log.append(2, vector(2), MODEL)
+    with open(log.path, "r+b") as f:
+        f.truncate(log.size() - 5)
+
+    reopened = EmbeddingLog(log.path)
+    entries, records = reopened.replay(MODEL)
+
+    assert list(entries) == [1] and records == 1
+    assert reopened.size() == intact
+    # New records land on a record boundary again
+    reopened.append(3, vector(3), MODEL)
+    entries, _ = EmbeddingLog(log.path).replay(MODEL)
+    assert entries.keys() == {1, 3}
+
+
+def test_replay_without_repair_leaves_a_torn_tail():
+    log = EmbeddingLog(os.path.join("index", "faces.idx"))
+    log.append(1, vector(1), MODEL)
+    log.append(2, vector(2), MODEL)
+    with open(log.path, "r+b") as f:
+        f.truncate(log.size() - 5)
+    size = log.size()
+
+    entries, _ = EmbeddingLog(log.path).replay(MODEL, repair=False)
+
+    assert list(entries) == [1]
+    assert log.size() == size
+
+
+def test_replay_rejects_another_model():
+    log = EmbeddingLog(os.path.join("index", "faces.idx"))
+    log.append(1, vector(1), MODEL)
+
+    entries, records = EmbeddingLog(log.path).replay("ArcFace")
+
+    assert entries is None and records == 0
@@ -0,0 +1,109 @@
+import sys
+from types import ModuleType, SimpleNamespace
+
+import numpy as np
+import pytest
+
+# Stand-in for deepface, so enrollment runs without the models and every embedding is counted
+DIM = 128
+deepface_calls = []
+
+
+class StubModel:
+    input_shape = (32, 32)
+
+    def forward(self, batch):
+        deepface_calls.append(("forward", len(batch)))
+        rows = np.random.default_rng(len(deepface_calls)).standard_normal((len(batch), DIM))
+        return rows[0].tolist() if len(batch) == 1 else rows.tolist()
+
+
+class StubDeepFace:
+    @staticmethod
+    def build_model(model_name, task=None):
+        return StubModel()
+
+    @staticmethod
+    def extract_faces(img_path, **kwargs):
+        return [{"face": np.zeros((32, 32, 3)), "facial_area": {"x": 0, "y": 0, "w": 32, "h": 32}, "confidence": 0.9}]
+
+    @staticmethod
+    def represent(img_path, **kwargs):
+        deepface_calls.append(("represent", img_path))
+        embedding = np.random.default_rng(len(deepface_calls)).standard_normal(DIM)
+        return [{"embedding": embedding.tolist(), "facial_area": {}}]
+
+
+deepface = ModuleType("deepface")
+deepface.DeepFace = StubDeepFace
+deepface.modules = ModuleType("deepface.modules")
+deepface.modules.preprocessing = SimpleNamespace(
+    resize_image=lambda img, target_size: np.zeros((1,) + target_size + (3,), dtype=np.float32),
+    normalize_input=lambda img, normalization="base": img,
+)
+sys.modules["deepface"] = deepface
+sys.modules["deepface.modules"] = deepface.modules
+
+import detect
+from config import INDEX_PATH
+from face_index import FaceIndex, EmbeddingLog
+
+
+@pytest.fixture(autouse=True)
+def calls():
+    deepface_calls.clear()
+    return deepface_calls
+
+
+def restart(monkeypatch, students):
+    """Fresh in-memory index and log handle, as a new process would have, then the startup load"""
+    monkeypatch.setattr(detect, "face_index", FaceIndex())
+    monkeypatch.setattr(detect, "embedding_log", EmbeddingLog(INDEX_PATH))
+    detect.build_face_index(students)
+    return detect.face_index
+
+
+def students(n):
+    return [SimpleNamespace(id=i, image=f"images/student-{i}.jpg") for i in range(1, n + 1)]
+
+
+@pytest.mark.parametrize("store_dtype", ["float16", "none"])
+@pytest.mark.parametrize("n", [1, 25])
+def test_enrolling_n_students_costs_n_embeddings(monkeypatch, calls, store_dtype, n):
+    monkeypatch.setattr(detect, "EMBEDDING_STORE_DTYPE", store_dtype)
+    enrolled = students(n)
+    index = restart(monkeypatch, [])
+
+    # What /add_student/ does with an upload
+    for student in enrolled:
+        _, embedding, _ = detect.prepare_enrollment(np.zeros((64, 64, 3), dtype=np.uint8))
+        detect.enroll_student(student.id, embedding)
+    assert len(calls) == n
+    assert len(index) == n
+
+    # Restarts load the log (or its snapshot) instead of re-embedding anyone
+    for _ in range(2):
+        index = restart(monkeypatch, enrolled)
+        assert len(calls) == n
+        assert sorted(index.live_ids().tolist()) == [s.id for s in enrolled]
+
+
+def test_students_missing_from_the_log_are_embedded_once(monkeypatch, calls):
+    enrolled = students(10)
+
+    restart(monkeypatch, enrolled)
+    assert sorted(image for _, image in calls) == sorted(s.image for s in enrolled)
+
+    index = restart(monkeypatch, enrolled)
+    assert len(calls) == 10
+    assert len(index) == 10
+
+
+def test_removed_students_leave_the_index_without_embedding_others(monkeypatch, calls):
+    enrolled = students(5)
+    restart(monkeypatch, enrolled)
+
+    index = restart(monkeypatch, enrolled[:3])
+
+    assert len(calls) == 5
+    assert sorted(index.live_ids().tolist()) == [1, 2, 3]
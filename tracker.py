@@ -0,0 +1,138 @@
+import threading
+import time
+
+from config import TRACKER_IOU_THRESHOLD, TRACKER_MAX_MISSED, TRACKER_REVERIFY_SECONDS, TRACKER_PENDING_SECONDS
+
+
+def iou(a, b):
+    """Intersection-over-union of two {"x", "y", "w", "h"} boxes"""
+    x1, y1 = max(a["x"], b["x"]), max(a["y"], b["y"])
+    x2 = min(a["x"] + a["w"], b["x"] + b["w"])
+    y2 = min(a["y"] + a["h"], b["y"] + b["h"])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = a["w"] * a["h"] + b["w"] * b["h"] - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        self.missed = 0
+        self.student_id = None
+        self.verified_at = None
+        # When the outstanding embedding was requested, or None
+        self.pending_since = None
+
+    @property
+    def pending(self):
+        return self.pending_since is not None
+
+
+class FaceTracker:
+    """IoU tracker that keeps one identity per face track across consecutive frames
+
+    A face only needs embedding when its track is new or its identity is older than
+    the re-verification interval; every other frame reuses the track's identity.
+    A requested embedding that never comes back (dropped or failed job) stops
+    blocking the track after pending_seconds.
+    """
+
+    def __init__(self, iou_threshold=TRACKER_IOU_THRESHOLD, max_missed=TRACKER_MAX_MISSED,
+                 reverify_seconds=TRACKER_REVERIFY_SECONDS, pending_seconds=TRACKER_PENDING_SECONDS):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.reverify_seconds = reverify_seconds
+        self.pending_seconds = pending_seconds
+        self._tracks = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self.faces_seen = 0
+        self.embeddings_requested = 0
+
+    def update(self, faces, now=None):
+        """Attach "track_id" and "needs_embedding" (and any known "student_id") to each face"""
+        now = time.time() if now is None else now
+        with self._lock:
+            # Greedy association, best overlaps first
+            pairs = sorted(
+                (
+                    (iou(track.box, face["facial_area"]), track_id, i)
+                    for track_id, track in self._tracks.items()
+                    for i, face in enumerate(faces)
+                ),
+                reverse=True
+            )
+            assigned_tracks, assigned_faces = set(), set()
+            for overlap, track_id, i in pairs:
+                if overlap < self.iou_threshold:
+                    break
+                if track_id in assigned_tracks or i in assigned_faces:
+                    continue
+                assigned_tracks.add(track_id)
+                assigned_faces.add(i)
+                faces[i]["track_id"] = track_id
+
+            for i, face in enumerate(faces):
+                if i not in assigned_faces:
+                    track_id = self._next_id
+                    self._next_id += 1
+                    self._tracks[track_id] = Track(track_id, face["facial_area"])
+                    assigned_tracks.add(track_id)
+                    face["track_id"] = track_id
+
+            # Age out tracks that disappeared
+            for track_id in list(self._tracks):
+                if track_id not in assigned_tracks:
+                    self._tracks[track_id].missed += 1
+                    if self._tracks[track_id].missed > self.max_missed:
+                        del self._tracks[track_id]
+
+            for face in faces:
+                track = self._tracks[face["track_id"]]
+                track.box = face["facial_area"]
+                track.missed = 0
+                stale = track.verified_at is None or now - track.verified_at >= self.reverify_seconds
+                waiting = track.pending and now - track.pending_since < self.pending_seconds
+                face["needs_embedding"] = stale and not waiting
+                face["student_id"] = track.student_id
+                if face["needs_embedding"]:
+                    track.pending_since = now
+                    self.embeddings_requested += 1
+            self.faces_seen += len(faces)
+
+        return faces
+
+    def set_identity(self, track_id, student_id, now=None):
+        """Store the matched identity (None for unknown) for the rest of the track's lifetime"""
+        with self._lock:
+            track = self._tracks.get(track_id)
+            if track is not None:
+                track.student_id = student_id
+                track.verified_at = time.time() if now is None else now
+                track.pending_since = None
+
+    def release(self, track_id):
+        """Let a track be embedded again after a failed attempt"""
+        with self._lock:
+            track = self._tracks.get(track_id)
+            if track is not None:
+                track.pending_since = None
+
+    def reset(self):
+        """Forget every track (a restarted pipeline starts from a clean slate)"""
+        with self._lock:
+            self._tracks = {}
+
+    def visible(self):
+        """(box, student_id) of every track seen in the latest frame, for drawing overlays"""
+        with self._lock:
+            return [(t.box, t.student_id) for t in self._tracks.values() if t.missed == 0]
+
+    def status(self):
+        return {
+            "active_tracks": len(self._tracks),
+            "faces_seen": self.faces_seen,
+            "embeddings_requested": self.embeddings_requested,
+            "embeddings_per_face": round(self.embeddings_requested / self.faces_seen, 3) if self.faces_seen else 0.0,
+        }